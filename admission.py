@@ -0,0 +1,164 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, jsonify, request, session
+
+# Controle d'admission des routes qui ecrivent (POST/PUT/PATCH/DELETE), par
+# seaux a jetons:
+# - un seau par client (usager connecte, sinon adresse IP);
+# - un seau global pour /api/*, ou arrivent les rafales des bornes. Les
+#   formulaires du guichet n'y passent pas et ne font donc jamais la queue
+#   derriere les bornes.
+# Un seau peut passer en negatif: la requete attend alors -jetons/debit
+# secondes avant d'etre traitee (file d'attente bornee par ADMISSION_MAX_WAIT).
+# Au-dela, reponse 429 avec Retry-After. L'etat (seaux et compteurs) est dans
+# un petit fichier SQLite distinct de la base de l'application, partage par
+# tous les workers gunicorn.
+MUTATING_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+GLOBAL_BUCKET = '*'
+COUNTERS = ('admitted', 'delayed', 'rejected', 'wait_ms')
+PRUNE_EVERY = 1000
+UNAVAILABLE_RETRY_AFTER = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS counter (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+class AdmissionController:
+    def __init__(self, path: str, client_rate: float, client_burst: float, global_rate: float, global_burst: float, max_wait: float):
+        self.path = path
+        self.client = (client_rate, client_burst)
+        self.glob = (global_rate, global_burst)
+        self.max_wait = max_wait
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread et par processus (les workers sont forkes).
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.executescript(SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def acquire(self, client_key: str, use_global: bool) -> tuple[bool, float]:
+        """(True, attente) si la requete est admise, (False, Retry-After) sinon."""
+        buckets = [(client_key, *self.client)]
+        if use_global:
+            buckets.append((GLOBAL_BUCKET, *self.glob))
+        conn = self._connection()
+        now = time.time()
+        try:
+            # Verrou d'ecriture du fichier d'etat: sqlite3.OperationalError apres `timeout` secondes.
+            conn.execute('BEGIN IMMEDIATE')
+            levels, wait = [], 0.0
+            for key, rate, burst in buckets:
+                row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+                tokens -= 1
+                levels.append((key, tokens, now))
+                wait = max(wait, -tokens / rate)
+            if wait > self.max_wait:
+                self._bump(conn, rejected=1)
+                conn.execute('COMMIT')
+                return False, wait - self.max_wait
+            conn.executemany('INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)', levels)
+            admitted = self._bump(conn, admitted=1, delayed=int(wait > 0), wait_ms=round(wait * 1000))
+            if admitted % PRUNE_EVERY == 0:
+                self._prune(conn, now)
+            conn.execute('COMMIT')
+            return True, wait
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    def _bump(self, conn, **deltas) -> int:
+        for name, delta in deltas.items():
+            conn.execute(
+                'INSERT INTO counter (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+                (name, delta),
+            )
+        return conn.execute("SELECT value FROM counter WHERE name = 'admitted'").fetchone()[0]
+
+    def _prune(self, conn, now: float):
+        # Un seau client inactif assez longtemps est plein: inutile de le garder.
+        rate, burst = self.client
+        conn.execute('DELETE FROM bucket WHERE key != ? AND updated < ?', (GLOBAL_BUCKET, now - burst / rate))
+
+    def stats(self) -> dict:
+        conn = self._connection()
+        counters = dict.fromkeys(COUNTERS, 0)
+        counters.update(conn.execute('SELECT name, value FROM counter').fetchall())
+        row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (GLOBAL_BUCKET,)).fetchone()
+        rate, burst = self.glob
+        counters['global_tokens'] = burst if row is None else round(min(burst, row[0] + (time.time() - row[1]) * rate), 2)
+        counters['tracked_clients'] = conn.execute('SELECT COUNT(*) FROM bucket WHERE key != ?', (GLOBAL_BUCKET,)).fetchone()[0]
+        return counters
+
+
+def client_key() -> str:
+    if session.get('user_id'):
+        return f"user:{session['user_id']}"
+    if session.get('admin'):
+        return f'admin:{request.remote_addr}'
+    return f'ip:{request.remote_addr}'
+
+
+def retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+def rejection(status: int, wait: float, error: str, message: str):
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': error, 'retry_after': int(retry_after(wait))})
+    else:
+        response = current_app.response_class(message, mimetype='text/plain')
+    response.status_code = status
+    response.headers['Retry-After'] = retry_after(wait)
+    return response
+
+
+def admit_request():
+    """before_request: file d'attente bornee ou 429 pour les routes qui ecrivent."""
+    if request.method not in MUTATING_METHODS or request.endpoint == 'static':
+        return None
+    controller = current_app.extensions['admission']
+    try:
+        admitted, wait = controller.acquire(client_key(), use_global=request.path.startswith('/api/'))
+    except sqlite3.OperationalError:
+        # Fichier d'etat verrouille trop longtemps: refus propre plutot qu'une erreur 500.
+        return rejection(503, UNAVAILABLE_RETRY_AFTER, 'service unavailable', 'Service surcharge, reessayez dans quelques secondes.')
+    if not admitted:
+        return rejection(429, wait, 'too many requests', 'Trop de requetes, reessayez dans quelques secondes.')
+    if wait > 0:
+        time.sleep(wait)
+    return None
+
+
+def admission_stats():
+    if not session.get('admin'):
+        return jsonify({'error': 'admin session required'}), 403
+    return jsonify(current_app.extensions['admission'].stats())
+
+
+def init_admission(app):
+    config = app.config
+    app.extensions['admission'] = AdmissionController(
+        config['ADMISSION_STATE_PATH'],
+        config['ADMISSION_CLIENT_RATE'],
+        config['ADMISSION_CLIENT_BURST'],
+        config['ADMISSION_GLOBAL_RATE'],
+        config['ADMISSION_GLOBAL_BURST'],
+        config['ADMISSION_MAX_WAIT'],
+    )
+    app.add_url_rule('/api/admission', 'admission_stats', admission_stats)
+    if config['ADMISSION_ENABLED']:
+        app.before_request(admit_request)
@@ -0,0 +1,148 @@
+from flask import Blueprint, current_app, request, jsonify, session
+from models import db, User, Book
+from datetime import datetime, timedelta
+from db_routing import read_replica
+import rollups
+from recommendations import similar_books
+import changefeed
+import services
+
+# API JSON (/api/*) des bornes et des integrations. Enregistree par
+# create_app() (app.py), comme le blueprint des pages HTML (views.py).
+api = Blueprint('api', __name__)
+
+# Serialiseurs de reference: les routes /api passent par les requetes en
+# colonnes de services.py, qui doivent produire le meme JSON.
+def book_to_dict(b: Book):
+    return {
+        'id': b.id,
+        'title': b.title,
+        'author': b.author,
+        'isbn': b.isbn,
+        'publisher': b.publisher,
+        'publication_year': b.publication_year,
+        'language': b.language,
+        'category': b.category,
+        'total_copies': b.total_copies,
+        'available_copies': b.available_copies()
+    }
+
+def user_to_dict(u: User):
+    return {
+        'id': u.id,
+        'name': u.name,
+        'email': u.email,
+        'card_number': u.card_number,
+        'affiliation': u.affiliation,
+        'registered_on': u.registered_on.isoformat(),
+        'approved': u.approved,
+        'is_active': u.is_active,
+        'active_loans': u.active_loans_count()
+    }
+
+@api.route('/api/books')
+@read_replica
+def api_books():
+    return jsonify(services.list_books(db.session))
+
+@api.route('/api/users')
+@read_replica
+def api_users():
+    return jsonify(services.list_users(db.session))
+
+@api.route('/api/loans')
+@read_replica
+def api_loans():
+    return jsonify(services.list_loans(db.session))
+
+@api.route('/api/stats')
+@read_replica
+def api_stats():
+    return jsonify(services.library_stats(db.session))
+
+@api.route('/api/books/<int:book_id>/similar')
+@read_replica
+def api_similar_books(book_id):
+    limit = min(max(request.args.get('limit', 10, type=int) or 10, 1), 50)
+    return jsonify([
+        {'id': b.id, 'title': b.title, 'author': b.author, 'score': round(score, 4)}
+        for b, score in similar_books(book_id, limit=limit)
+    ])
+
+@api.route('/api/changes')
+@read_replica
+def api_changes():
+    since = request.args.get('since', 0, type=int) or 0
+    limit = min(max(request.args.get('limit', 500, type=int) or 500, 1), current_app.config['CHANGES_MAX_LIMIT'])
+    floor = changefeed.compacted_through()
+    if 0 < since < floor:
+        return jsonify({'error': 'since is older than the compacted history, full resync required', 'resync': True, 'min_since': floor}), 410
+    return jsonify(changefeed.changes_since(since, limit))
+
+@api.route('/api/analytics/circulation')
+@read_replica
+def api_circulation():
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if 'end' in request.args else datetime.utcnow().date()
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+    book_id = request.args.get('book_id', type=int)
+    return jsonify(rollups.circulation_series(start, end, book_id))
+
+@api.route('/api/analytics/users/<int:user_id>')
+@read_replica
+def api_user_analytics(user_id):
+    return jsonify(rollups.user_series(user_id))
+
+@api.route('/api/latest-books')
+@read_replica
+def api_latest_books():
+    return jsonify(services.list_books(db.session, limit=6))
+
+@api.route('/api/suggest')
+def api_suggest():
+    kind = request.args.get('type', 'book')
+    if kind not in ('book', 'user'):
+        return jsonify({'error': 'type must be book or user'}), 400
+    if kind == 'user' and not session.get('admin'):
+        return jsonify({'error': 'admin session required'}), 403
+    limit = min(max(request.args.get('limit', 10, type=int) or 10, 1), current_app.config['SUGGEST_MAX_RESULTS'])
+    return jsonify(current_app.extensions['suggest_index'].search(kind, request.args.get('q', ''), limit))
+
+@api.route('/api/borrow', methods=['POST'])
+def api_borrow():
+    body, status = services.borrow(db.session, request.get_json() or {}, current_app.config['MAX_ACTIVE_LOANS'], current_app.config['DEFAULT_LOAN_DAYS'])
+    if status < 400:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return jsonify(body), status
+
+@api.route('/api/reserve', methods=['POST'])
+def api_reserve():
+    body, status = services.reserve(db.session, request.get_json() or {}, current_app.config['DEFAULT_RESERVATION_DAYS'])
+    if status < 400:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return jsonify(body), status
+
+@api.route('/api/transactions', methods=['POST'])
+def api_transactions():
+    """Lot d'emprunts/reservations/retours avec cles d'idempotence, valide par tranches."""
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    config = current_app.config
+    if len(operations) > config['BULK_MAX_OPERATIONS']:
+        return jsonify({'error': f"at most {config['BULK_MAX_OPERATIONS']} operations per request"}), 413
+    results = []
+    chunk_size = config['BULK_CHUNK_SIZE']
+    for start in range(0, len(operations), chunk_size):
+        services.begin_batch(db.session)
+        for op in operations[start:start + chunk_size]:
+            results.append(services.apply_operation(db.session, op, config['MAX_ACTIVE_LOANS'], config['DEFAULT_LOAN_DAYS'], config['DEFAULT_RESERVATION_DAYS']))
+        db.session.commit()
+    return jsonify(services.batch_summary(results))
@@ -0,0 +1,65 @@
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, literal, select
+from models import db, Loan, Reservation, LoanHistory, ReservationHistory
+
+# Separation chaud/froid: les emprunts rendus et les reservations inactives plus
+# anciens que le seuil sont deplaces (meme id) vers LoanHistory et
+# ReservationHistory, pour que les requetes sur les emprunts actifs ne
+# parcourent jamais tout l'historique. Loan et Reservation sont en AUTOINCREMENT
+# sous SQLite, pour qu'un id archive ne soit jamais reattribue. Tache periodique:
+#   python archive.py --older-than-days 180
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+BATCH_SIZE = 5000
+LOAN_COLUMNS = ('id', 'user_id', 'book_id', 'borrowed_on', 'due_date', 'returned', 'returned_on')
+RESERVATION_COLUMNS = ('id', 'user_id', 'book_id', 'reserved_on', 'expires_on', 'active')
+
+
+def _move(session, source, target, columns, condition, batch_size: int) -> int:
+    moved = 0
+    while True:
+        ids = [row.id for row in session.query(source.id).filter(condition).order_by(source.id).limit(batch_size)]
+        if not ids:
+            return moved
+        rows = select(*[getattr(source, c) for c in columns], literal(datetime.utcnow())).where(source.id.in_(ids))
+        session.execute(insert(target).from_select(list(columns) + ['archived_on'], rows))
+        session.execute(delete(source).where(source.id.in_(ids)))
+        session.commit()
+        moved += len(ids)
+
+
+def archive_closed(older_than_days: int = DEFAULT_ARCHIVE_AFTER_DAYS, batch_size: int = BATCH_SIZE, session=None) -> tuple[int, int]:
+    session = session or db.session
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    loans = _move(
+        session, Loan, LoanHistory, LOAN_COLUMNS,
+        (Loan.returned == True) & (func.coalesce(Loan.returned_on, Loan.due_date, Loan.borrowed_on) < cutoff),
+        batch_size,
+    )
+    reservations = _move(
+        session, Reservation, ReservationHistory, RESERVATION_COLUMNS,
+        (Reservation.active == False) & (Reservation.reserved_on < cutoff),
+        batch_size,
+    )
+    return loans, reservations
+
+
+def delete_history(session=None, **filters):
+    """Supprime l'historique archive d'un usager ou d'un livre (user_id=... / book_id=...)."""
+    session = session or db.session
+    for model in (LoanHistory, ReservationHistory):
+        session.query(model).filter_by(**filters).delete(synchronize_session=False)
+
+
+if __name__ == '__main__':
+    from app import create_app, ensure_database
+    app = create_app()
+    ensure_database(app)
+
+    parser = argparse.ArgumentParser(description='Archive les emprunts et reservations termines')
+    parser.add_argument('--older-than-days', type=int, default=DEFAULT_ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    with app.app_context():
+        loans, reservations = archive_closed(args.older_than_days, args.batch_size)
+    print(f'✓ {loans} emprunt(s) et {reservations} reservation(s) archives')
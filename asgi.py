@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import sqlite3
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import services
+from json_provider import dumps_bytes
+from admission import UNAVAILABLE_RETRY_AFTER, retry_after
+from app import create_app, ensure_database
+from models import db
+
+# Mode de service asynchrone pour l'API JSON utilisee par les bornes:
+#   uvicorn asgi:application --workers 2
+# Les routes /api/books, /api/stats, /api/borrow, /api/reserve et
+# /api/transactions sont servies
+# par un pilote asynchrone (aiosqlite / asyncpg) avec un pool de connexions;
+# toutes les autres requetes sont transmises a l'application Flask.
+# Les regles metier sont celles de services.py, executees via run_sync.
+ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', '10'))
+ASYNC_DB_MAX_OVERFLOW = int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', '10'))
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_database_url(url):
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f'Aucun pilote asynchrone pour {url.get_backend_name()}')
+    return url.set(drivername=driver)
+
+
+async def read_json(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+async def send_json(send, body, status: int, extra_headers=()):
+    payload = dumps_bytes(body)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode('ascii')),
+            *extra_headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+class AsyncApi:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.fallback = WsgiToAsgi(flask_app)
+        with flask_app.app_context():
+            url = async_database_url(db.engine.url)
+        self.engine = create_async_engine(url, pool_size=ASYNC_DB_POOL_SIZE, max_overflow=ASYNC_DB_MAX_OVERFLOW)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.routes = {
+            ('GET', '/api/books'): self.books,
+            ('GET', '/api/stats'): self.stats,
+            ('POST', '/api/borrow'): self.borrow,
+            ('POST', '/api/reserve'): self.reserve,
+            ('POST', '/api/transactions'): self.transactions,
+        }
+
+    async def books(self, session, data):
+        return await session.run_sync(services.list_books), 200
+
+    async def stats(self, session, data):
+        return await session.run_sync(services.library_stats), 200
+
+    async def borrow(self, session, data):
+        body, status = await session.run_sync(services.borrow, data, self.config['MAX_ACTIVE_LOANS'], self.config['DEFAULT_LOAN_DAYS'])
+        if status < 400:
+            await session.commit()
+        return body, status
+
+    async def reserve(self, session, data):
+        body, status = await session.run_sync(services.reserve, data, self.config['DEFAULT_RESERVATION_DAYS'])
+        if status < 400:
+            await session.commit()
+        return body, status
+
+    async def transactions(self, session, data):
+        operations = data.get('operations') if isinstance(data, dict) else data
+        if not isinstance(operations, list) or not operations:
+            return {'error': 'operations must be a non-empty list'}, 400
+        config = self.config
+        if len(operations) > config['BULK_MAX_OPERATIONS']:
+            return {'error': f"at most {config['BULK_MAX_OPERATIONS']} operations per request"}, 413
+
+        def apply_chunk(sync_session, chunk):
+            services.begin_batch(sync_session)
+            return [services.apply_operation(sync_session, op, config['MAX_ACTIVE_LOANS'], config['DEFAULT_LOAN_DAYS'], config['DEFAULT_RESERVATION_DAYS']) for op in chunk]
+
+        results = []
+        chunk_size = config['BULK_CHUNK_SIZE']
+        for start in range(0, len(operations), chunk_size):
+            results.extend(await session.run_sync(apply_chunk, operations[start:start + chunk_size]))
+            await session.commit()
+        return services.batch_summary(results), 200
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Meme preparation de la base que le premier appel WSGI, faite au demarrage.
+                await asyncio.to_thread(ensure_database, self.flask_app)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is None:
+            return await self.fallback(scope, receive, send)
+        if scope['method'] == 'POST' and self.config['ADMISSION_ENABLED']:
+            # Meme controle d'admission que les routes Flask (seaux partages).
+            client = scope.get('client') or ('unknown', 0)
+            # acquire() ouvre le fichier SQLite partage (attente de verrou possible): hors de la boucle.
+            try:
+                admitted, wait = await asyncio.to_thread(self.flask_app.extensions['admission'].acquire, f'ip:{client[0]}', use_global=True)
+            except sqlite3.OperationalError:
+                return await send_json(send, {'error': 'service unavailable', 'retry_after': UNAVAILABLE_RETRY_AFTER}, 503,
+                                       [(b'retry-after', retry_after(UNAVAILABLE_RETRY_AFTER).encode('ascii'))])
+            if not admitted:
+                return await send_json(send, {'error': 'too many requests', 'retry_after': int(retry_after(wait))}, 429,
+                                       [(b'retry-after', retry_after(wait).encode('ascii'))])
+            if wait > 0:
+                await asyncio.sleep(wait)
+        data = await read_json(receive) if scope['method'] == 'POST' else None
+        async with self.sessions() as session:
+            body, status = await handler(session, data or {})
+        await send_json(send, body, status)
+
+
+application = AsyncApi(create_app())
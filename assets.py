@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel: sans lui seules les variantes gzip sont produites
+    brotli = None
+
+# Chaine de construction des fichiers statiques:
+#   python assets.py
+# minifie les CSS/JS de static/, ajoute une empreinte (hash) au nom de fichier,
+# precompresse chaque fichier (gzip, brotli si disponible) dans static/dist/
+# et ecrit static/dist/manifest.json. Les templates utilisent asset_url() qui
+# renvoie l'URL avec empreinte, servie avec un cache long et immuable.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_MIMETYPES = {'text/html', 'application/json'}
+COMPRESS_MIN_SIZE = 500
+
+
+def minify_css(source: str) -> str:
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source: str) -> str:
+    # Minification prudente: commentaires de ligne, indentation et lignes vides.
+    lines = []
+    for line in source.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('//'):
+            continue
+        lines.append(stripped)
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def build(static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR) -> dict:
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_dir]
+        for filename in sorted(files):
+            base, ext = os.path.splitext(filename)
+            if ext not in MINIFIERS:
+                continue
+            source_path = os.path.join(root, filename)
+            relative = os.path.relpath(source_path, static_dir).replace(os.sep, '/')
+            with open(source_path, encoding='utf-8') as f:
+                content = MINIFIERS[ext](f.read()).encode('utf-8')
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            hashed = os.path.join(os.path.dirname(relative), f'{base}.{digest}{ext}').replace(os.sep, '/')
+            target = os.path.join(dist_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(content)
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(content, compresslevel=9))
+            if brotli is not None:
+                with open(target + '.br', 'wb') as f:
+                    f.write(brotli.compress(content))
+            manifest[relative] = hashed
+    os.makedirs(dist_dir, exist_ok=True)
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def accepted_encodings() -> list[str]:
+    accept = request.headers.get('Accept-Encoding', '')
+    encodings = []
+    if brotli is not None and 'br' in accept:
+        encodings.append('br')
+    if 'gzip' in accept:
+        encodings.append('gzip')
+    return encodings
+
+
+def serve_asset(filename: str):
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accepted_encodings() and os.path.isfile(os.path.join(DIST_DIR, filename + suffix)):
+            response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(DIST_DIR, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def compress_response(response):
+    """after_request: compresse les reponses HTML/JSON si le client l'accepte."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers):
+        return response
+    encodings = accepted_encodings()
+    data = response.get_data()
+    if not encodings or len(data) < COMPRESS_MIN_SIZE:
+        return response
+    if encodings[0] == 'br':
+        response.set_data(brotli.compress(data, quality=5))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = encodings[0]
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_assets(app):
+    manifest = load_manifest()
+
+    def asset_url(filename: str) -> str:
+        if filename in manifest:
+            return url_for('dist_asset', filename=manifest[filename])
+        return url_for('static', filename=filename)
+
+    app.add_url_rule('/assets/<path:filename>', 'dist_asset', serve_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.after_request(compress_response)
+
+
+if __name__ == '__main__':
+    built = build()
+    print(f'✓ {len(built)} fichiers statiques construits dans {DIST_DIR}')
@@ -0,0 +1,202 @@
+import argparse
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from models import db, AuditLog
+
+# Journal d'audit: pagination par cle (id decroissant) et filtres indexes pour
+# /admin/audit, plus une retention qui deplace les vieilles entrees vers des
+# fichiers JSON Lines compresses: chaque lot ecrit, pour chaque jour, un fichier
+# immuable audit-AAAA-MM-JJ-<premier id>.jsonl.gz (ecrit a cote puis renomme en
+# place) avant de supprimer ses lignes. Une reprise apres interruption retrouve
+# le fichier deja ecrit par son nom et ne reecrit que les entrees absentes.
+#   python audit_log.py rotate --keep-days 90
+#   python audit_log.py search --action LOAN_RETURNED --from 2024-01-01 --to 2024-03-31
+DEFAULT_KEEP_DAYS = 90
+ROTATE_BATCH_SIZE = 5000
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def parse_ref(value: str | None) -> tuple[str | None, int | None]:
+    """'admin' -> ('admin', None); 'loan#12' -> ('loan', 12)."""
+    if not value:
+        return None, None
+    kind, _, ref_id = value.strip().partition('#')
+    try:
+        return kind or None, int(ref_id) if ref_id else None
+    except ValueError:
+        return kind or None, None
+
+
+def parse_day(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def log_to_dict(log) -> dict:
+    return {
+        'id': log.id,
+        'actor_type': log.actor_type,
+        'actor_id': log.actor_id,
+        'action': log.action,
+        'entity_type': log.entity_type,
+        'entity_id': log.entity_id,
+        'payload': log.payload,
+        'created_on': log.created_on.isoformat()
+    }
+
+
+def matches(entry: dict, actor=None, action=None, entity=None, start=None, end=None) -> bool:
+    actor_type, actor_id = parse_ref(actor)
+    entity_type, entity_id = parse_ref(entity)
+    created_on = datetime.fromisoformat(entry['created_on'])
+    return (
+        (actor_type is None or entry['actor_type'] == actor_type)
+        and (actor_id is None or entry['actor_id'] == actor_id)
+        and (not action or entry['action'] == action)
+        and (entity_type is None or entry['entity_type'] == entity_type)
+        and (entity_id is None or entry['entity_id'] == entity_id)
+        and (start is None or created_on >= start)
+        and (end is None or created_on < end + timedelta(days=1))
+    )
+
+
+def search_logs(actor=None, action=None, entity=None, start=None, end=None, before_id=None, limit=100, session=None):
+    """Page de journaux (id decroissant) et id a passer en before_id pour la suite."""
+    session = session or db.session
+    query = session.query(AuditLog)
+    actor_type, actor_id = parse_ref(actor)
+    entity_type, entity_id = parse_ref(entity)
+    if actor_type:
+        query = query.filter(AuditLog.actor_type == actor_type)
+    if actor_id is not None:
+        query = query.filter(AuditLog.actor_id == actor_id)
+    if action:
+        query = query.filter(AuditLog.action == action)
+    if entity_type:
+        query = query.filter(AuditLog.entity_type == entity_type)
+    if entity_id is not None:
+        query = query.filter(AuditLog.entity_id == entity_id)
+    if start:
+        query = query.filter(AuditLog.created_on >= start)
+    if end:
+        query = query.filter(AuditLog.created_on < end + timedelta(days=1))
+    if before_id:
+        query = query.filter(AuditLog.id < before_id)
+    logs = query.order_by(AuditLog.id.desc()).limit(limit + 1).all()
+    next_before = logs[limit - 1].id if len(logs) > limit else None
+    return logs[:limit], next_before
+
+
+def archived_ids(path: str) -> set:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return {json.loads(line)['id'] for line in f}
+
+
+def part_path(archive_dir: str, day: str, first_id: int) -> str:
+    # id sur 12 chiffres: l'ordre alphabetique des fichiers d'un jour suit les id.
+    return os.path.join(archive_dir, f'audit-{day}-{first_id:012d}.jsonl.gz')
+
+
+def write_part(path: str, entries: list[dict]):
+    """Ecrit un fichier d'archive complet a cote, puis le renomme en place."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            with gzip.open(out, 'wt', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=True) + '\n')
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def rotate(archive_dir: str, keep_days: int = DEFAULT_KEEP_DAYS, batch_size: int = ROTATE_BATCH_SIZE, session=None) -> int:
+    """Deplace les entrees plus anciennes que keep_days vers les fichiers journaliers."""
+    session = session or db.session
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = datetime.utcnow() - timedelta(days=keep_days)
+    moved = 0
+    while True:
+        logs = (
+            session.query(AuditLog)
+            .filter(AuditLog.created_on < cutoff)
+            .order_by(AuditLog.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not logs:
+            return moved
+        by_day = {}
+        for log in logs:
+            by_day.setdefault(log.created_on.strftime(DATE_FORMAT), []).append(log_to_dict(log))
+        for day, entries in by_day.items():
+            while entries:
+                path = part_path(archive_dir, day, entries[0]['id'])
+                if not os.path.exists(path):
+                    write_part(path, entries)
+                    break
+                # Lot deja ecrit avant une interruption: seules les entrees absentes restent a ecrire.
+                already = archived_ids(path)
+                if entries[0]['id'] not in already:
+                    raise RuntimeError(f'archive incoherente: {path} ne contient pas l entree {entries[0]["id"]}')
+                entries = [entry for entry in entries if entry['id'] not in already]
+        session.query(AuditLog).filter(AuditLog.id.in_([log.id for log in logs])).delete(synchronize_session=False)
+        session.commit()
+        moved += len(logs)
+
+
+def search_archive(archive_dir: str, actor=None, action=None, entity=None, start=None, end=None):
+    """Parcourt hors ligne les fichiers archives; seuls les jours de l'intervalle sont ouverts."""
+    if not os.path.isdir(archive_dir):
+        return
+    for filename in sorted(os.listdir(archive_dir)):
+        if not (filename.startswith('audit-') and filename.endswith('.jsonl.gz')):
+            continue
+        # audit-AAAA-MM-JJ-<id>.jsonl.gz, ou audit-AAAA-MM-JJ.jsonl.gz (anciennes archives)
+        day = parse_day(filename[len('audit-'):len('audit-AAAA-MM-JJ')])
+        if day is None or (start and day < start.replace(hour=0, minute=0, second=0)) or (end and day > end):
+            continue
+        with gzip.open(os.path.join(archive_dir, filename), 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if matches(entry, actor, action, entity, start, end):
+                    yield entry
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Retention et recherche du journal d audit')
+    parser.add_argument('--dir', default=os.environ.get('AUDIT_ARCHIVE_DIR'))
+    commands = parser.add_subparsers(dest='command', required=True)
+    rotate_parser = commands.add_parser('rotate')
+    rotate_parser.add_argument('--keep-days', type=int, default=DEFAULT_KEEP_DAYS)
+    search_parser = commands.add_parser('search')
+    search_parser.add_argument('--actor')
+    search_parser.add_argument('--action')
+    search_parser.add_argument('--entity')
+    search_parser.add_argument('--from', dest='start')
+    search_parser.add_argument('--to', dest='end')
+    args = parser.parse_args()
+
+    if args.command == 'rotate':
+        from app import create_app, ensure_database
+        app = create_app()
+        ensure_database(app)
+        with app.app_context():
+            archive_dir = args.dir or app.config['AUDIT_ARCHIVE_DIR']
+            moved = rotate(archive_dir, args.keep_days)
+        print(f'✓ {moved} entree(s) d audit archivee(s) dans {archive_dir}')
+    else:
+        # Recherche hors ligne: n'a besoin ni de la base ni de l'application.
+        archive_dir = args.dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'audit_archive')
+        for entry in search_archive(archive_dir, args.actor, args.action, args.entity, parse_day(args.start), parse_day(args.end)):
+            print(json.dumps(entry, ensure_ascii=False))
@@ -0,0 +1,175 @@
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, insert, literal, select
+from sqlalchemy.orm import Session
+from flask import current_app
+from models import db, Book, Loan, Reservation, LoanHistory, ReservationHistory, ChangeEvent, ChangeFeedState
+from facets import available_copies_map
+from services import loan_to_dict, reservation_to_dict
+
+# Flux de modifications pour la synchronisation incrementale des bornes:
+# chaque flush qui cree, modifie ou supprime un Book, Loan ou Reservation
+# ajoute une ligne ChangeEvent (seq croissant). Un emprunt/retour ajoute aussi
+# un evenement sur le livre, dont la disponibilite change.
+# /api/changes?since=<seq> renvoie l'etat courant des entites modifiees.
+# Sous SQLite les ecritures sont serialisees: l'ordre des seq est celui des
+# commits. Ailleurs (PostgreSQL) un seq peut etre valide apres un seq plus
+# grand; on ne sert alors que les evenements plus vieux que CHANGES_COMMIT_LAG
+# secondes, pour qu'un client ne depasse pas une transaction encore en cours.
+# Compaction periodique:  python changefeed.py --tombstone-days 30
+TRACKED = {Book: 'book', Loan: 'loan', Reservation: 'reservation'}
+DEFAULT_TOMBSTONE_DAYS = 30
+COMMIT_ORDERED_DIALECTS = ('sqlite',)
+
+
+def _collect(session, objects, deleted: bool, changes: dict):
+    for obj in objects:
+        entity_type = TRACKED.get(type(obj))
+        if entity_type is None or obj.id is None:
+            continue
+        changes[(entity_type, obj.id)] = deleted
+        if entity_type == 'loan' and obj.book_id is not None:
+            changes.setdefault(('book', obj.book_id), False)
+
+
+@event.listens_for(Session, 'after_flush')
+def record_flushed_changes(session, flush_context):
+    changes = {}
+    _collect(session, session.new, False, changes)
+    _collect(session, [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)], False, changes)
+    _collect(session, session.deleted, True, changes)
+    if not changes:
+        return
+    now = datetime.utcnow()
+    session.connection().execute(insert(ChangeEvent), [
+        {'entity_type': entity_type, 'entity_id': entity_id, 'deleted': deleted, 'created_on': now}
+        for (entity_type, entity_id), deleted in changes.items()
+    ])
+
+
+def record_bulk_delete(entity_type: str, ids, session=None):
+    """Pour les suppressions en masse (Query.delete) qui ne passent pas par le flush."""
+    session = session or db.session
+    ids = list(ids)
+    if ids:
+        now = datetime.utcnow()
+        session.execute(insert(ChangeEvent), [
+            {'entity_type': entity_type, 'entity_id': entity_id, 'deleted': True, 'created_on': now}
+            for entity_id in ids
+        ])
+
+
+def bootstrap(session=None):
+    """Publie l'etat existant (base anterieure au flux) comme premiers evenements."""
+    session = session or db.session
+    now = datetime.utcnow()
+    for model, entity_type in TRACKED.items():
+        rows = select(literal(entity_type), model.id, literal(False), literal(now)).order_by(model.id)
+        session.execute(insert(ChangeEvent).from_select(['entity_type', 'entity_id', 'deleted', 'created_on'], rows))
+    session.commit()
+
+
+def compacted_through(session=None) -> int:
+    session = session or db.session
+    state = session.get(ChangeFeedState, 1)
+    return state.compacted_through if state else 0
+
+
+def _load_states(session, entity_type: str, ids) -> dict:
+    if entity_type == 'book':
+        books = session.query(Book).filter(Book.id.in_(ids)).all()
+        available = available_copies_map(books, session)
+        return {b.id: {
+            'id': b.id,
+            'title': b.title,
+            'author': b.author,
+            'isbn': b.isbn,
+            'publisher': b.publisher,
+            'publication_year': b.publication_year,
+            'language': b.language,
+            'category': b.category,
+            'total_copies': b.total_copies,
+            'available_copies': available[b.id]
+        } for b in books}
+    # Un emprunt ou une reservation archive n'est pas supprime: on le lit dans l'historique.
+    if entity_type == 'loan':
+        models, serialize = (Loan, LoanHistory), loan_to_dict
+    else:
+        models, serialize = (Reservation, ReservationHistory), reservation_to_dict
+    states = {}
+    for model in models:
+        states.update({obj.id: serialize(obj) for obj in session.query(model).filter(model.id.in_(ids))})
+    return states
+
+
+def commit_horizon(session) -> datetime | None:
+    """Date au-dela de laquelle les evenements ne sont pas encore servis (None = aucune)."""
+    if session.get_bind().dialect.name in COMMIT_ORDERED_DIALECTS:
+        return None
+    return datetime.utcnow() - timedelta(seconds=current_app.config['CHANGES_COMMIT_LAG'])
+
+
+def changes_since(since: int, limit: int, session=None) -> dict:
+    session = session or db.session
+    query = session.query(ChangeEvent).filter(ChangeEvent.seq > since)
+    horizon = commit_horizon(session)
+    if horizon is not None:
+        query = query.filter(ChangeEvent.created_on < horizon)
+    events = query.order_by(ChangeEvent.seq.asc()).limit(limit + 1).all()
+    has_more = len(events) > limit
+    events = events[:limit]
+    # Une entite modifiee plusieurs fois n'est renvoyee qu'une fois, a son dernier seq.
+    latest = {}
+    for ev in events:
+        latest[(ev.entity_type, ev.entity_id)] = ev
+    by_type = {}
+    for entity_type, entity_id in latest:
+        by_type.setdefault(entity_type, []).append(entity_id)
+    states = {entity_type: _load_states(session, entity_type, ids) for entity_type, ids in by_type.items()}
+    changes = []
+    for (entity_type, entity_id), ev in sorted(latest.items(), key=lambda item: item[1].seq):
+        data = states[entity_type].get(entity_id)
+        changes.append({
+            'seq': ev.seq,
+            'type': entity_type,
+            'id': entity_id,
+            'deleted': data is None,
+            'data': data
+        })
+    return {
+        'changes': changes,
+        'next_since': events[-1].seq if events else since,
+        'has_more': has_more
+    }
+
+
+def compact(tombstone_days: int = DEFAULT_TOMBSTONE_DAYS, session=None) -> tuple[int, int]:
+    """Garde le dernier evenement de chaque entite et purge les vieilles suppressions."""
+    session = session or db.session
+    latest = select(func.max(ChangeEvent.seq)).group_by(ChangeEvent.entity_type, ChangeEvent.entity_id)
+    superseded = session.query(ChangeEvent).filter(ChangeEvent.seq.notin_(latest)).delete(synchronize_session=False)
+    cutoff = datetime.utcnow() - timedelta(days=tombstone_days)
+    old_tombstones = session.query(ChangeEvent).filter(ChangeEvent.deleted == True, ChangeEvent.created_on < cutoff)
+    purged_through = old_tombstones.with_entities(func.max(ChangeEvent.seq)).scalar()
+    purged = old_tombstones.delete(synchronize_session=False)
+    if purged_through:
+        state = session.get(ChangeFeedState, 1)
+        if state is None:
+            state = ChangeFeedState(id=1, compacted_through=0)
+            session.add(state)
+        state.compacted_through = max(state.compacted_through or 0, purged_through)
+    session.commit()
+    return superseded, purged
+
+
+if __name__ == '__main__':
+    from app import create_app, ensure_database
+    app = create_app()
+    ensure_database(app)
+
+    parser = argparse.ArgumentParser(description='Compacte le flux de modifications')
+    parser.add_argument('--tombstone-days', type=int, default=DEFAULT_TOMBSTONE_DAYS)
+    args = parser.parse_args()
+    with app.app_context():
+        superseded, purged = compact(args.tombstone_days)
+    print(f'✓ {superseded} evenement(s) remplace(s) et {purged} suppression(s) purgee(s)')
@@ -0,0 +1,40 @@
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+# Routage lecture/ecriture: si DATABASE_REPLICA_URL est configuree, les routes
+# decorees par @read_replica lisent sur la replique ('replica' dans
+# SQLALCHEMY_BINDS), tout le reste passe par la base primaire. Apres une
+# ecriture, le client reste colle a la primaire pendant REPLICA_STICKY_SECONDS
+# pour relire ses propres modifications.
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or isinstance(clause, UpdateBase):
+                g.db_wrote = True
+            elif g.get('db_use_replica') and REPLICA_BIND in self._db.engines:
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(f):
+    """Route en lecture seule: lit sur la replique sauf ecriture recente du client."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        written_at = session.get('db_written_at')
+        sticky_seconds = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+        g.db_use_replica = not (written_at and time.time() - written_at < sticky_seconds)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def remember_writes(response):
+    """after_request: memorise l'heure de la derniere ecriture de ce client."""
+    if g.get('db_wrote') and REPLICA_BIND in current_app.config.get('SQLALCHEMY_BINDS', {}):
+        session['db_written_at'] = time.time()
+    return response
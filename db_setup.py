@@ -0,0 +1,119 @@
+from flask import current_app
+from sqlalchemy import func, text
+from models import db, Book, Loan, Reservation, LoanHistory, ReservationHistory, FacetCount, BookDailyStat, BookTotalStat, ChangeEvent
+from facets import rebuild_facet_counts
+import rollups
+import changefeed
+
+# Creation des tables, migrations SQLite legeres, index et donnees minimales.
+# Autrefois executes a l'import de app.py; desormais appeles une fois par
+# processus par app.ensure_database(), a la premiere requete ou, avec gunicorn
+# --preload, dans le processus parent avant le fork des workers.
+
+
+def sqlite_add_column_if_missing(table_name: str, column_name: str, ddl_fragment: str):
+    cols = [row[1] for row in db.session.execute(text(f"PRAGMA table_info({table_name})")).fetchall()]
+    if column_name not in cols:
+        db.session.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl_fragment}"))
+        db.session.commit()
+
+
+def sqlite_enable_autoincrement(model, history_model):
+    """Reconstruit une table creee sans AUTOINCREMENT (procedure SQLite: copie puis echange)."""
+    table_name = model.__tablename__
+    ddl = db.session.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table_name}).scalar()
+    if ddl is None or 'AUTOINCREMENT' in ddl.upper():
+        return
+    old_columns = {row[1] for row in db.session.execute(text(f"PRAGMA table_info({table_name})")).fetchall()}
+    columns = ', '.join(c.name for c in model.__table__.columns if c.name in old_columns)
+    db.session.execute(text(f"ALTER TABLE {table_name} RENAME TO {table_name}_old"))
+    # Les index de l'ancienne table sont supprimes avec elle et recrees plus bas par prepare_database.
+    model.__table__.create(db.session.connection())
+    db.session.execute(text(f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {table_name}_old"))
+    db.session.execute(text(f"DROP TABLE {table_name}_old"))
+    # Les id deja archives ne doivent pas etre reattribues.
+    last_id = max(db.session.query(func.max(model.id)).scalar() or 0, db.session.query(func.max(history_model.id)).scalar() or 0)
+    db.session.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {'name': table_name})
+    db.session.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), {'name': table_name, 'seq': last_id})
+    db.session.commit()
+
+
+def prepare_database():
+    """Doit etre appele dans un contexte d'application."""
+    db.create_all()
+    user_columns = [row[1] for row in db.session.execute(text("PRAGMA table_info(user)")).fetchall()]
+    approved_column_added = False
+    if 'approved' not in user_columns:
+        sqlite_add_column_if_missing('user', 'approved', 'BOOLEAN DEFAULT 0')
+        approved_column_added = True
+    sqlite_add_column_if_missing('user', 'approved_on', 'DATETIME')
+    sqlite_add_column_if_missing('user', 'card_number', 'VARCHAR(32)')
+    sqlite_add_column_if_missing('user', 'affiliation', 'VARCHAR(80)')
+    sqlite_add_column_if_missing('user', 'phone', 'VARCHAR(32)')
+    sqlite_add_column_if_missing('user', 'is_active', 'BOOLEAN DEFAULT 1')
+    if approved_column_added:
+        db.session.execute(text("UPDATE user SET approved = 1"))
+    else:
+        db.session.execute(text("UPDATE user SET approved = 1 WHERE approved IS NULL"))
+    db.session.execute(text("UPDATE user SET is_active = 1 WHERE is_active IS NULL"))
+    db.session.execute(text("UPDATE user SET affiliation = 'Public' WHERE affiliation IS NULL"))
+    db.session.execute(text("UPDATE user SET card_number = 'CARD-' || strftime('%Y','now') || '-' || printf('%08X', id) WHERE card_number IS NULL"))
+    db.session.execute(text("UPDATE user SET approved_on = registered_on WHERE approved = 1 AND approved_on IS NULL"))
+    db.session.commit()
+    db.session.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_user_card_number_unique ON user(card_number)"))
+    db.session.commit()
+    sqlite_add_column_if_missing('book', 'isbn', 'VARCHAR(20)')
+    sqlite_add_column_if_missing('book', 'publisher', 'VARCHAR(200)')
+    sqlite_add_column_if_missing('book', 'publication_year', 'INTEGER')
+    sqlite_add_column_if_missing('book', 'language', 'VARCHAR(60)')
+    sqlite_add_column_if_missing('book', 'category', 'VARCHAR(120)')
+    backfilled = db.session.execute(text("UPDATE book SET language = 'Français' WHERE language IS NULL")).rowcount
+    backfilled += db.session.execute(text("UPDATE book SET category = 'General' WHERE category IS NULL")).rowcount
+    db.session.commit()
+    db.session.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_book_isbn_unique ON book(isbn)"))
+    db.session.commit()
+    sqlite_add_column_if_missing('loan', 'returned_on', 'DATETIME')
+    # Lightweight SQLite migration for Reservation.expires_on.
+    sqlite_add_column_if_missing('reservation', 'expires_on', 'DATETIME')
+    reservation_days = current_app.config['RESERVATION_EXTENSION_DAYS']
+    db.session.execute(text(f"UPDATE reservation SET expires_on = datetime(reserved_on, '+{reservation_days} days') WHERE expires_on IS NULL"))
+    db.session.commit()
+    sqlite_enable_autoincrement(Loan, LoanHistory)
+    sqlite_enable_autoincrement(Reservation, ReservationHistory)
+    # Index pour la navigation par facettes et le calcul de disponibilite.
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_book_title ON book(title)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_book_category_title ON book(category, title)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_book_language_title ON book(language, title)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_book_publication_year ON book(publication_year)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_loan_book_returned ON loan(book_id, returned)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_loan_user_returned ON loan(user_id, returned)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_book_daily_stat_day ON book_daily_stat(day)"))
+    # Classement des livres les plus reserves (rollups.popular_books).
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_book_total_stat_reservations ON book_total_stat(reservations)"))
+    # Parcours des emprunts en retard par id (overdue_notices.py).
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_loan_returned_id ON loan(returned, id)"))
+    # Index des sections paginees de la page profil.
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_reservation_user_active ON reservation(user_id, active)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_loan_user_returned_borrowed ON loan(user_id, returned, borrowed_on)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_loan_history_user_borrowed ON loan_history(user_id, borrowed_on)"))
+    # Index du journal d'audit: chaque filtre suivi de l'id pour la pagination par cle.
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_audit_log_actor ON audit_log(actor_type, actor_id, id)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_audit_log_action ON audit_log(action, id)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_audit_log_entity ON audit_log(entity_type, entity_id, id)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_audit_log_created_on ON audit_log(created_on)"))
+    db.session.commit()
+    # seed minimal data if empty
+    if Book.query.count() == 0:
+        b1 = Book(title='Le Petit Prince', author='Antoine de Saint-Exupéry', total_copies=3)
+        b2 = Book(title='1984', author='George Orwell', total_copies=2)
+        db.session.add_all([b1, b2])
+        db.session.commit()
+    # Les valeurs completees ci-dessus changent les facettes deja comptees.
+    if backfilled or FacetCount.query.count() == 0:
+        rebuild_facet_counts()
+    if BookDailyStat.query.first() is None and (Loan.query.first() or Reservation.query.first()):
+        rollups.rebuild_rollups()
+    elif BookTotalStat.query.first() is None and BookDailyStat.query.first() is not None:
+        rollups.rebuild_totals()
+    if ChangeEvent.query.first() is None and Book.query.first() is not None:
+        changefeed.bootstrap()
@@ -0,0 +1,121 @@
+from sqlalchemy import func
+from models import db, increment_counters, Book, Loan, FacetCount
+
+# Facettes du catalogue: les compteurs sont maintenus dans FacetCount a chaque
+# modification (ajout/suppression de livre, emprunt, retour) pour eviter un
+# GROUP BY sur tout le catalogue a chaque affichage de /books.
+FACETS = ('category', 'language', 'decade', 'availability')
+AVAILABLE = 'disponible'
+UNAVAILABLE = 'indisponible'
+
+
+def decade_of(year: int | None) -> str | None:
+    if year is None:
+        return None
+    return str(year // 10 * 10)
+
+
+def facet_snapshot(book: Book, session=None) -> dict:
+    """Valeurs de facettes actuelles d'un livre (a prendre avant une modification)."""
+    session = session or db.session
+    borrowed = session.query(func.count(Loan.id)).filter(Loan.book_id == book.id, Loan.returned == False).scalar()
+    return {
+        'category': book.category,
+        'language': book.language,
+        'decade': decade_of(book.publication_year),
+        'availability': AVAILABLE if (book.total_copies or 0) - borrowed > 0 else UNAVAILABLE,
+    }
+
+
+def _bump(session, facet: str, value: str | None, delta: int):
+    # Increment atomique (upsert sur facet, value): pas de lecture prealable,
+    # donc pas de mise a jour perdue entre deux workers.
+    if value is None or delta == 0:
+        return
+    increment_counters(session, FacetCount, {'facet': facet, 'value': value}, count=delta)
+
+
+def update_facet_counts(before: dict | None, after: dict | None, session=None):
+    """Applique la difference entre deux snapshots (None = livre absent)."""
+    session = session or db.session
+    before = before or {}
+    after = after or {}
+    for facet in FACETS:
+        old_value, new_value = before.get(facet), after.get(facet)
+        if old_value == new_value:
+            continue
+        _bump(session, facet, old_value, -1)
+        _bump(session, facet, new_value, 1)
+
+
+def rebuild_facet_counts():
+    """Recalcule entierement la table FacetCount (initialisation ou reparation)."""
+    FacetCount.query.delete(synchronize_session=False)
+    counts = {}
+    for column, facet in ((Book.category, 'category'), (Book.language, 'language')):
+        for value, count in db.session.query(column, func.count(Book.id)).filter(column.isnot(None)).group_by(column):
+            counts[(facet, value)] = count
+    decade_expr = (Book.publication_year // 10) * 10
+    for decade, count in db.session.query(decade_expr, func.count(Book.id)).filter(Book.publication_year.isnot(None)).group_by(decade_expr):
+        counts[('decade', str(int(decade)))] = count
+    available_total = Book.query.filter(available_filter()).count()
+    counts[('availability', AVAILABLE)] = available_total
+    counts[('availability', UNAVAILABLE)] = Book.query.count() - available_total
+    for (facet, value), count in counts.items():
+        db.session.add(FacetCount(facet=facet, value=value, count=count))
+    db.session.commit()
+
+
+def facet_counts() -> dict:
+    """Retourne {facette: [(valeur, nombre), ...]} depuis la table precalculee."""
+    result = {facet: [] for facet in FACETS}
+    rows = FacetCount.query.filter(FacetCount.count > 0).order_by(FacetCount.facet, FacetCount.value).all()
+    for row in rows:
+        result.setdefault(row.facet, []).append((row.value, row.count))
+    return result
+
+
+def active_loans_subquery():
+    return (
+        db.session.query(func.count(Loan.id))
+        .filter(Loan.book_id == Book.id, Loan.returned == False)
+        .correlate(Book)
+        .scalar_subquery()
+    )
+
+
+def available_filter():
+    return Book.total_copies > active_loans_subquery()
+
+
+def filter_books(query, category=None, language=None, decade=None, availability=None):
+    if category:
+        query = query.filter(Book.category == category)
+    if language:
+        query = query.filter(Book.language == language)
+    if decade:
+        try:
+            start = int(decade)
+        except ValueError:
+            start = None
+        if start is not None:
+            query = query.filter(Book.publication_year >= start, Book.publication_year < start + 10)
+    if availability == AVAILABLE:
+        query = query.filter(available_filter())
+    elif availability == UNAVAILABLE:
+        query = query.filter(~available_filter())
+    return query
+
+
+def available_copies_map(books, session=None) -> dict:
+    """Copies disponibles pour une page de livres, en une seule requete groupee."""
+    session = session or db.session
+    ids = [b.id for b in books]
+    if not ids:
+        return {}
+    borrowed = dict(
+        session.query(Loan.book_id, func.count(Loan.id))
+        .filter(Loan.book_id.in_(ids), Loan.returned == False)
+        .group_by(Loan.book_id)
+    )
+    return {b.id: max(0, (b.total_copies or 0) - borrowed.get(b.id, 0)) for b in books}
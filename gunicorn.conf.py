@@ -0,0 +1,17 @@
+# Configuration gunicorn (lue automatiquement depuis le dossier courant):
+#   gunicorn -c gunicorn.conf.py
+# L'application est chargee une fois dans le processus parent (preload),
+# qui prepare la base, l'index de suggestion et les templates avant de
+# forker les workers: chaque worker demarre deja chaud, sans reimporter
+# Flask/SQLAlchemy ni rejouer les migrations. Le port ($PORT) et le nombre
+# de workers ($WEB_CONCURRENCY) restent lus dans l'environnement par gunicorn.
+wsgi_app = 'app:create_app()'
+preload_app = True
+
+
+def on_starting(server):
+    from app import warm_up
+    flask_app = server.app.wsgi()
+    warm_up(flask_app)
+    timings = ', '.join(f'{phase} {ms} ms' for phase, ms in flask_app.extensions['startup_timings'].items())
+    server.log.info('Application prechargee: %s', timings)
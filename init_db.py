@@ -1,5 +1,6 @@
-from app import app, db
-from models import User, Book
+from app import create_app, ensure_database
+from models import db, User, Book
+from facets import rebuild_facet_counts
 from datetime import datetime
 
 books_data = [
@@ -89,9 +90,9 @@ users_data = [
     ('Jean Dubois', 'jean.dubois@example.com'),
 ]
 
+app = create_app()
+ensure_database(app)
 with app.app_context():
-    db.create_all()
-    
     # Ajouter les livres dynamiquement (sans duplicatas)
     added_books = 0
     for idx, (title, author, copies) in enumerate(books_data, start=1):
@@ -124,6 +125,7 @@ with app.app_context():
             added_users += 1
     
     db.session.commit()
+    rebuild_facet_counts()
     
     total_books = Book.query.count()
     total_users = User.query.count()
@@ -0,0 +1,42 @@
+import json
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel: sans lui on garde le module json standard
+    orjson = None
+
+# Encodeur JSON de l'application (app.json): orjson quand il est installe, et
+# les dates toujours en ISO 8601, comme les anciens *_to_dict. Les requetes
+# de l'API peuvent donc renvoyer les datetime tels quels, sans isoformat()
+# champ par champ.
+
+
+def _default(o):
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+def dumps_bytes(obj, sort_keys: bool = False) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, default=_default, sort_keys=sort_keys, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj, self.sort_keys).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        # En mode debug la sortie indentee de Flask est conservee.
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, self.sort_keys), mimetype=self.mimetype)
@@ -1,7 +1,23 @@
 from datetime import datetime, timedelta
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def increment_counters(session, model, keys: dict, **deltas):
+    """Ajoute deltas aux compteurs de la ligne identifiee par keys (contrainte
+    unique), en la creant au besoin: une seule instruction
+    INSERT ... ON CONFLICT DO UPDATE, sans lecture prealable, donc sans
+    increment perdu ni conflit d'unicite entre transactions concurrentes."""
+    insert = UPSERT_INSERTS[session.get_bind().dialect.name]
+    statement = insert(model).values(**keys, **deltas).on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: getattr(model, name) + delta for name, delta in deltas.items()},
+    )
+    session.execute(statement)
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -48,6 +64,9 @@ class Loan(db.Model):
     returned = db.Column(db.Boolean, default=False)
     returned_on = db.Column(db.DateTime, nullable=True)
 
+    # AUTOINCREMENT: un id deplace dans LoanHistory ne doit jamais etre reattribue.
+    __table_args__ = {'sqlite_autoincrement': True}
+
 class Reservation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -56,6 +75,8 @@ class Reservation(db.Model):
     expires_on = db.Column(db.DateTime, default=lambda: datetime.utcnow() + timedelta(days=7))
     active = db.Column(db.Boolean, default=True)
 
+    __table_args__ = {'sqlite_autoincrement': True}
+
 class AuditLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     actor_type = db.Column(db.String(32), nullable=False)  # admin, user, system
@@ -65,3 +86,109 @@ class AuditLog(db.Model):
     entity_id = db.Column(db.Integer, nullable=True)
     payload = db.Column(db.Text, nullable=True)
     created_on = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class FacetCount(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    facet = db.Column(db.String(32), nullable=False)  # category, language, decade, availability
+    value = db.Column(db.String(120), nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('facet', 'value', name='uq_facet_count_facet_value'),)
+
+class BookDailyStat(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    loans = db.Column(db.Integer, default=0, nullable=False)
+    returns = db.Column(db.Integer, default=0, nullable=False)
+    reservations = db.Column(db.Integer, default=0, nullable=False)
+    overdue = db.Column(db.Integer, default=0, nullable=False)  # emprunts en retard releves ce jour-la
+
+    __table_args__ = (db.UniqueConstraint('book_id', 'day', name='uq_book_daily_stat_book_day'),)
+
+class UserMonthlyStat(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Date, nullable=False)  # premier jour du mois
+    loans = db.Column(db.Integer, default=0, nullable=False)
+    returns = db.Column(db.Integer, default=0, nullable=False)
+    reservations = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'month', name='uq_user_monthly_stat_user_month'),)
+
+class BookTotalStat(db.Model):
+    # Cumul depuis l'origine, pour le classement des livres les plus reserves.
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, nullable=False, unique=True)
+    loans = db.Column(db.Integer, default=0, nullable=False)
+    returns = db.Column(db.Integer, default=0, nullable=False)
+    reservations = db.Column(db.Integer, default=0, nullable=False)
+
+class UserTotalStat(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, unique=True)
+    loans = db.Column(db.Integer, default=0, nullable=False)
+    returns = db.Column(db.Integer, default=0, nullable=False)
+    reservations = db.Column(db.Integer, default=0, nullable=False)
+
+class BookSimilarity(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, nullable=False)
+    similar_book_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)  # cosinus sur les co-emprunts
+    co_borrowers = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index('idx_book_similarity_book_score', 'book_id', 'score'),)
+
+class ChangeEvent(db.Model):
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    entity_type = db.Column(db.String(32), nullable=False)  # book, loan, reservation
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted = db.Column(db.Boolean, default=False, nullable=False)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # AUTOINCREMENT: SQLite ne doit jamais reutiliser un seq apres une compaction.
+    __table_args__ = (
+        db.Index('idx_change_event_entity', 'entity_type', 'entity_id', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+
+class ChangeFeedState(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    compacted_through = db.Column(db.Integer, default=0, nullable=False)  # suppressions purgees jusqu'a ce seq
+
+class ApiOperation(db.Model):
+    """Operation appliquee par /api/transactions, rejouee telle quelle si la meme cle revient."""
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(100), unique=True, nullable=False)  # cle d'idempotence fournie par le client
+    operation = db.Column(db.String(16), nullable=False)  # borrow, reserve, return
+    status = db.Column(db.Integer, nullable=False)
+    response = db.Column(db.Text, nullable=False)  # corps JSON renvoye a la premiere execution
+    created_on = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class LoanHistory(db.Model):
+    """Emprunts termines deplaces hors de la table Loan (meme id)."""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False, index=True)
+    borrowed_on = db.Column(db.DateTime)
+    due_date = db.Column(db.DateTime)
+    returned = db.Column(db.Boolean, default=True)
+    returned_on = db.Column(db.DateTime, nullable=True)
+    archived_on = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    user = db.relationship('User')
+    book = db.relationship('Book')
+
+class ReservationHistory(db.Model):
+    """Reservations inactives deplacees hors de la table Reservation (meme id)."""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False, index=True)
+    reserved_on = db.Column(db.DateTime)
+    expires_on = db.Column(db.DateTime)
+    active = db.Column(db.Boolean, default=False)
+    archived_on = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    user = db.relationship('User')
+    book = db.relationship('Book')
@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.charset import Charset, QP
+from email.message import Message
+from email.mime.text import MIMEText
+from models import db, User, Book, Loan
+
+# Rappels de retard, tache periodique:
+#   python overdue_notices.py [--outbox DIR] [--smtp localhost:1025] [--workers 4]
+# Les emprunts en retard (non rendus, due_date depassee) sont lus par lots
+# (pagination par id, jointure User et Book, colonnes seulement), rendus avec
+# templates/notices/overdue.txt et deposes par un pool de threads dans la
+# boite d'envoi: un fichier .eml par emprunt, ou un serveur SMTP local.
+# Apres chaque lot, checkpoint.json memorise le dernier id traite: une
+# execution interrompue reprend la ou elle s'etait arretee, avec la meme date
+# de reference. Dans un lot, chaque rappel depose est note aussitot dans
+# checkpoint.json.delivered: a la reprise, le lot interrompu est relu mais les
+# rappels deja envoyes (SMTP) ne le sont pas une seconde fois.
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_WORKERS = 4
+NOTICE_SUBJECT = 'Rappel: ouvrage a rendre a la bibliotheque'
+NOTICE_SENDER = os.environ.get('NOTICE_SENDER', 'bibliotheque@plateau.local')
+# MIMEText (politique compat32) plutot qu'EmailMessage: meme fichier .eml,
+# environ dix fois moins couteux a construire.
+NOTICE_CHARSET = Charset('utf-8')
+NOTICE_CHARSET.body_encoding = QP
+
+
+def overdue_batches(as_of: datetime, after_id: int = 0, batch_size: int = DEFAULT_BATCH_SIZE, session=None):
+    session = session or db.session
+    while True:
+        rows = (
+            session.query(
+                Loan.id.label('loan_id'), Loan.borrowed_on, Loan.due_date,
+                User.name, User.email, User.card_number, Book.title, Book.author,
+            )
+            .join(User, User.id == Loan.user_id)
+            .join(Book, Book.id == Loan.book_id)
+            .filter(Loan.returned == False, Loan.due_date < as_of, Loan.id > after_id)
+            .order_by(Loan.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1].loan_id
+
+
+def build_notice(template, row, as_of: datetime) -> Message:
+    message = MIMEText(template.render(
+        name=row.name,
+        title=row.title,
+        author=row.author,
+        card_number=row.card_number,
+        borrowed_on=row.borrowed_on,
+        due_date=row.due_date,
+        days_overdue=(as_of - row.due_date).days
+    ), 'plain', NOTICE_CHARSET)
+    message['From'] = NOTICE_SENDER
+    message['To'] = row.email
+    message['Subject'] = NOTICE_SUBJECT
+    message['X-Loan-Id'] = str(row.loan_id)
+    return message
+
+
+class FileOutbox:
+    """Un fichier loan-<id>.eml par rappel, ecrit de facon atomique."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def deliver(self, loan_id: int, message: Message):
+        path = os.path.join(self.directory, f'loan-{loan_id}.eml')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(message.as_bytes())
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        pass
+
+
+class SmtpOutbox:
+    """Envoi vers un serveur SMTP local (ex: python -m aiosmtpd -n -l localhost:1025)."""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def deliver(self, loan_id: int, message: Message):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = smtplib.SMTP(self.host, self.port)
+            with self._lock:
+                self._connections.append(conn)
+        conn.send_message(message)
+
+    def close(self):
+        for conn in self._connections:
+            conn.quit()
+
+
+def load_checkpoint(path: str) -> dict | None:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(path: str, state: dict):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+class DeliveryLog:
+    """Ids des rappels deposes depuis le dernier checkpoint, une ligne par id."""
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        self.delivered = set()
+        if not restart and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                # Une derniere ligne tronquee (arret pendant l'ecriture) est ignoree.
+                self.delivered = {int(line) for line in f if line.endswith('\n')}
+        self._file = open(path, 'w' if restart else 'a', encoding='utf-8')
+
+    def record(self, loan_id: int):
+        with self._lock:
+            self.delivered.add(loan_id)
+            self._file.write(f'{loan_id}\n')
+            self._file.flush()
+
+    def forget_through(self, last_loan_id: int):
+        """Apres un checkpoint: seuls les ids du lot en cours restent utiles."""
+        with self._lock:
+            self.delivered = {loan_id for loan_id in self.delivered if loan_id > last_loan_id}
+            self._file.close()
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                f.writelines(f'{loan_id}\n' for loan_id in sorted(self.delivered))
+            os.replace(self.path + '.tmp', self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        self._file.close()
+
+
+def generate_notices(template, outbox, checkpoint_path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                     workers: int = DEFAULT_WORKERS, restart: bool = False) -> dict:
+    state = None if restart else load_checkpoint(checkpoint_path)
+    if state is None:
+        state = {'as_of': datetime.utcnow().isoformat(), 'last_loan_id': 0, 'sent': 0, 'done': False}
+    if state['done']:
+        return state
+    as_of = datetime.fromisoformat(state['as_of'])
+    log = DeliveryLog(checkpoint_path + '.delivered', restart)
+    already_delivered = frozenset(log.delivered)
+
+    def deliver(row):
+        if row.loan_id in already_delivered:
+            return
+        outbox.deliver(row.loan_id, build_notice(template, row, as_of))
+        log.record(row.loan_id)
+
+    def finish(futures, last_loan_id):
+        for future in futures:
+            future.result()
+        state['last_loan_id'] = last_loan_id
+        state['sent'] += len(futures)
+        save_checkpoint(checkpoint_path, state)
+        log.forget_through(last_loan_id)
+
+    # Le lot suivant est lu pendant que le pool depose le precedent: au plus
+    # deux lots en memoire.
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = None
+            for rows in overdue_batches(as_of, state['last_loan_id'], batch_size):
+                futures = [pool.submit(deliver, row) for row in rows]
+                if pending:
+                    finish(*pending)
+                pending = (futures, rows[-1].loan_id)
+            if pending:
+                finish(*pending)
+    finally:
+        log.close()
+    state['done'] = True
+    save_checkpoint(checkpoint_path, state)
+    return state
+
+
+if __name__ == '__main__':
+    from app import create_app, ensure_database
+    from views import log_action
+
+    parser = argparse.ArgumentParser(description='Genere les rappels de retard')
+    parser.add_argument('--outbox', help='dossier de la boite d envoi (defaut: instance/outbox/overdue-AAAA-MM-JJ)')
+    parser.add_argument('--smtp', help='host:port d un serveur SMTP local au lieu de fichiers .eml')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--restart', action='store_true', help='ignore le checkpoint existant')
+    args = parser.parse_args()
+    app = create_app()
+    ensure_database(app)
+
+    outbox_dir = args.outbox or os.path.join(app.instance_path, 'outbox', f'overdue-{datetime.utcnow():%Y-%m-%d}')
+    os.makedirs(outbox_dir, exist_ok=True)
+    if args.smtp:
+        host, _, port = args.smtp.partition(':')
+        outbox = SmtpOutbox(host, int(port or 25))
+    else:
+        outbox = FileOutbox(outbox_dir)
+    checkpoint_path = os.path.join(outbox_dir, 'checkpoint.json')
+    previous = 0 if args.restart else (load_checkpoint(checkpoint_path) or {}).get('sent', 0)
+    started = time.perf_counter()
+    with app.app_context():
+        template = app.jinja_env.get_template('notices/overdue.txt')
+        try:
+            state = generate_notices(template, outbox, checkpoint_path, args.batch_size, args.workers, args.restart)
+        finally:
+            outbox.close()
+        sent = state['sent'] - previous
+        if sent:
+            log_action('system', None, 'OVERDUE_NOTICES_GENERATED', 'loan', None, {'sent': sent, 'as_of': state['as_of']})
+            db.session.commit()
+    print(f"✓ {sent} rappel(s) de retard ({state['sent']} au total) dans {args.smtp or outbox_dir} en {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,103 @@
+from datetime import datetime
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import joinedload
+from models import db, Book, Loan, Reservation, LoanHistory
+from facets import available_copies_map
+
+# Requetes de la page profil (/profile/<id>): chaque section est paginee et
+# charge ses livres par jointure, les compteurs sont calcules en SQL. Le cout
+# d'affichage ne depend plus du nombre d'emprunts passes de l'usager.
+
+
+def _page(query, page: int, per_page: int):
+    rows = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
+
+
+def profile_summary(user_id: int, session=None) -> dict:
+    session = session or db.session
+    now = datetime.utcnow()
+
+    def count(model, *conditions):
+        return select(func.count(model.id)).where(model.user_id == user_id, *conditions).scalar_subquery()
+
+    active, overdue, returned, archived, reservations = session.execute(select(
+        count(Loan, Loan.returned == False),
+        count(Loan, Loan.returned == False, Loan.due_date < now),
+        count(Loan, Loan.returned == True),
+        count(LoanHistory),
+        count(Reservation, Reservation.active == True),
+    )).one()
+    return {
+        'active_loans': active,
+        'overdue_loans': overdue,
+        'returned_loans': returned + archived,
+        'total_loans': active + returned + archived,
+        'active_reservations': reservations
+    }
+
+
+def active_loans_page(user_id: int, page: int, per_page: int, session=None):
+    session = session or db.session
+    query = (
+        session.query(Loan)
+        .options(joinedload(Loan.book))
+        .filter(Loan.user_id == user_id, Loan.returned == False)
+        .order_by(Loan.due_date.asc(), Loan.id.asc())
+    )
+    return _page(query, page, per_page)
+
+
+def active_reservations_page(user_id: int, page: int, per_page: int, session=None):
+    """(reservations, suivante?, copies disponibles par livre)."""
+    session = session or db.session
+    query = (
+        session.query(Reservation)
+        .options(joinedload(Reservation.book))
+        .filter(Reservation.user_id == user_id, Reservation.active == True)
+        .order_by(Reservation.reserved_on.asc(), Reservation.id.asc())
+    )
+    reservations, has_next = _page(query, page, per_page)
+    available = available_copies_map({r.book for r in reservations}, session)
+    return reservations, has_next, available
+
+
+def history_cursor(row) -> str:
+    return f'{row.borrowed_on.isoformat()}_{row.id}'
+
+
+def parse_history_cursor(value: str | None) -> tuple[datetime, int] | None:
+    """'2024-03-01T10:00:00_42' -> (datetime, 42); None ou invalide -> premiere page."""
+    if not value:
+        return None
+    borrowed_on, _, loan_id = value.rpartition('_')
+    try:
+        return datetime.fromisoformat(borrowed_on), int(loan_id)
+    except ValueError:
+        return None
+
+
+def loan_history_page(user_id: int, before: tuple[datetime, int] | None, per_page: int, session=None):
+    """Emprunts rendus, table chaude et historique archive confondus, du plus recent
+    au plus ancien, apres le curseur (borrowed_on, id). Chaque table ne fournit que
+    ses per_page + 1 premieres lignes (index par usager et date), fusionnees ici:
+    le cout d'une page ne depend pas de la taille de l'historique."""
+    session = session or db.session
+    columns = ('id', 'book_id', 'borrowed_on', 'due_date', 'returned_on')
+    rows = []
+    for model, condition in ((Loan, Loan.returned == True), (LoanHistory, None)):
+        query = (
+            select(*[getattr(model, c) for c in columns], Book.title, Book.author)
+            .join(Book, Book.id == model.book_id)
+            .where(model.user_id == user_id)
+        )
+        if condition is not None:
+            query = query.where(condition)
+        if before is not None:
+            borrowed_on, loan_id = before
+            query = query.where(or_(model.borrowed_on < borrowed_on, and_(model.borrowed_on == borrowed_on, model.id < loan_id)))
+        query = query.order_by(model.borrowed_on.desc(), model.id.desc()).limit(per_page + 1)
+        rows.extend(session.execute(query).all())
+    rows.sort(key=lambda row: (row.borrowed_on, row.id), reverse=True)
+    page = rows[:per_page]
+    return page, history_cursor(page[-1]) if len(rows) > per_page else None
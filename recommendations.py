@@ -0,0 +1,105 @@
+import argparse
+import time
+from sqlalchemy import select
+from models import db, Book, Loan, LoanHistory, BookSimilarity
+
+# "Les lecteurs qui ont emprunte ce livre ont aussi emprunte": tache hors ligne
+#   python recommendations.py [--top-k 10] [--min-co-borrowers 2]
+# Construit la matrice creuse usagers x livres a partir de Loan et de
+# LoanHistory, calcule la similarite cosinus livre-livre (X^T X normalisee),
+# garde les top-k voisins de chaque livre et remplace la table BookSimilarity.
+# NumPy et SciPy ne sont necessaires que pour cette tache, pas pour servir l'application.
+DEFAULT_TOP_K = 10
+DEFAULT_MIN_CO_BORROWERS = 2
+READ_CHUNK = 100_000
+WRITE_CHUNK = 10_000
+
+
+def load_loan_pairs(session, chunk: int = READ_CHUNK):
+    import numpy as np
+
+    parts = []
+    for model in (Loan, LoanHistory):
+        result = session.execute(select(model.user_id, model.book_id).execution_options(yield_per=chunk))
+        for rows in result.partitions():
+            parts.append(np.asarray(rows, dtype=np.int64))
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.concatenate(parts)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def compute_similarities(user_ids, book_ids, top_k: int = DEFAULT_TOP_K, min_co_borrowers: int = DEFAULT_MIN_CO_BORROWERS):
+    """Retourne (livre, livre similaire, score, co-emprunteurs) sous forme de tableaux NumPy."""
+    import numpy as np
+    from scipy import sparse
+
+    if len(user_ids) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float64), empty
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    books, book_index = np.unique(book_ids, return_inverse=True)
+    # Matrice binaire: un usager qui a emprunte plusieurs fois le meme livre compte une fois.
+    matrix = sparse.csr_matrix(
+        (np.ones(len(user_index), dtype=np.float32), (user_index, book_index)),
+        shape=(len(users), len(books)),
+    )
+    matrix.data[:] = 1.0
+    co_counts = (matrix.T @ matrix).tocsr()
+    norms = np.sqrt(co_counts.diagonal())
+    co_counts.setdiag(0)
+    co_counts.data[co_counts.data < min_co_borrowers] = 0
+    co_counts.eliminate_zeros()
+
+    rows = np.repeat(np.arange(len(books)), np.diff(co_counts.indptr))
+    cols = co_counts.indices
+    counts = co_counts.data
+    scores = counts / (norms[rows] * norms[cols])
+    # Tri par livre puis score decroissant, puis rang dans chaque ligne pour garder le top-k.
+    order = np.lexsort((-scores, rows))
+    rank = np.arange(len(order)) - co_counts.indptr[rows[order]]
+    keep = order[rank < top_k]
+    return books[rows[keep]], books[cols[keep]], scores[keep].astype(np.float64), counts[keep].astype(np.int64)
+
+
+def rebuild_similarities(top_k: int = DEFAULT_TOP_K, min_co_borrowers: int = DEFAULT_MIN_CO_BORROWERS, session=None) -> int:
+    session = session or db.session
+    user_ids, book_ids = load_loan_pairs(session)
+    sources, targets, scores, counts = compute_similarities(user_ids, book_ids, top_k, min_co_borrowers)
+    session.query(BookSimilarity).delete(synchronize_session=False)
+    for start in range(0, len(sources), WRITE_CHUNK):
+        end = start + WRITE_CHUNK
+        session.bulk_insert_mappings(BookSimilarity, [
+            {'book_id': int(b), 'similar_book_id': int(s), 'score': float(score), 'co_borrowers': int(count)}
+            for b, s, score, count in zip(sources[start:end], targets[start:end], scores[start:end], counts[start:end])
+        ])
+    session.commit()
+    return len(sources)
+
+
+def similar_books(book_id: int, limit: int = DEFAULT_TOP_K, session=None):
+    """[(Book, score), ...] tries par score decroissant."""
+    session = session or db.session
+    return (
+        session.query(Book, BookSimilarity.score)
+        .join(BookSimilarity, BookSimilarity.similar_book_id == Book.id)
+        .filter(BookSimilarity.book_id == book_id)
+        .order_by(BookSimilarity.score.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+if __name__ == '__main__':
+    from app import create_app, ensure_database
+    app = create_app()
+    ensure_database(app)
+
+    parser = argparse.ArgumentParser(description='Recalcule les recommandations de co-emprunt')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+    parser.add_argument('--min-co-borrowers', type=int, default=DEFAULT_MIN_CO_BORROWERS)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    with app.app_context():
+        written = rebuild_similarities(args.top_k, args.min_co_borrowers)
+    print(f'✓ {written} similarite(s) enregistree(s) en {time.perf_counter() - started:.1f}s')
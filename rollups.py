@@ -0,0 +1,163 @@
+import sys
+from datetime import date, datetime
+from sqlalchemy import func, insert, select
+from models import db, increment_counters, Book, Loan, Reservation, LoanHistory, ReservationHistory, BookDailyStat, UserMonthlyStat, BookTotalStat, UserTotalStat
+
+# Tables d'agregats de circulation: BookDailyStat (par livre et par jour),
+# UserMonthlyStat (par usager et par mois), et les cumuls BookTotalStat et
+# UserTotalStat (une ligne par livre / par usager) qui servent le tableau de
+# bord des reservations sans parcourir l'historique. Elles sont incrementees par les
+# chemins d'emprunt/retour/reservation; le releve des retards et la
+# reconstruction complete passent par la tache periodique:
+#   python rollups.py            (releve des retards du jour)
+#   python rollups.py --rebuild  (recalcul depuis Loan et Reservation)
+COUNTERS = ('loans', 'returns', 'reservations')
+
+
+def month_of(day: date) -> date:
+    return day.replace(day=1)
+
+
+def record_event(counter: str, user_id: int, book_id: int, when: datetime | None = None, session=None):
+    """Incremente un compteur ('loans', 'returns' ou 'reservations')."""
+    session = session or db.session
+    day = (when or datetime.utcnow()).date()
+    increment_counters(session, BookDailyStat, {'book_id': book_id, 'day': day}, **{counter: 1})
+    increment_counters(session, UserMonthlyStat, {'user_id': user_id, 'month': month_of(day)}, **{counter: 1})
+    increment_counters(session, BookTotalStat, {'book_id': book_id}, **{counter: 1})
+    increment_counters(session, UserTotalStat, {'user_id': user_id}, **{counter: 1})
+
+
+def snapshot_overdue(now: datetime | None = None, session=None) -> int:
+    """Enregistre pour aujourd'hui le nombre d'emprunts en retard par livre."""
+    session = session or db.session
+    now = now or datetime.utcnow()
+    today = now.date()
+    session.query(BookDailyStat).filter_by(day=today).update({'overdue': 0}, synchronize_session=False)
+    overdue = (
+        session.query(Loan.book_id, func.count(Loan.id))
+        .filter(Loan.returned == False, Loan.due_date < now)
+        .group_by(Loan.book_id)
+        .all()
+    )
+    # Les compteurs du jour viennent d'etre remis a zero: ajouter revient a affecter.
+    for book_id, count in overdue:
+        increment_counters(session, BookDailyStat, {'book_id': book_id, 'day': today}, overdue=count)
+    session.commit()
+    return sum(count for _, count in overdue)
+
+
+def rebuild_rollups(session=None):
+    """Recalcule les agregats en parcourant l'historique par lots."""
+    session = session or db.session
+    session.query(BookDailyStat).delete(synchronize_session=False)
+    session.query(UserMonthlyStat).delete(synchronize_session=False)
+    books, users = {}, {}
+
+    def bump(counter, user_id, book_id, when):
+        if when is None:
+            return
+        day = when.date()
+        books.setdefault((book_id, day), dict.fromkeys(COUNTERS, 0))[counter] += 1
+        users.setdefault((user_id, month_of(day)), dict.fromkeys(COUNTERS, 0))[counter] += 1
+
+    # Tables chaudes et historique archive (voir archive.py)
+    for model in (Loan, LoanHistory):
+        loans = session.query(model.user_id, model.book_id, model.borrowed_on, model.returned, model.returned_on)
+        for user_id, book_id, borrowed_on, returned, returned_on in loans.yield_per(5000):
+            bump('loans', user_id, book_id, borrowed_on)
+            if returned:
+                bump('returns', user_id, book_id, returned_on)
+    for model in (Reservation, ReservationHistory):
+        reservations = session.query(model.user_id, model.book_id, model.reserved_on)
+        for user_id, book_id, reserved_on in reservations.yield_per(5000):
+            bump('reservations', user_id, book_id, reserved_on)
+
+    session.bulk_insert_mappings(BookDailyStat, [
+        dict(book_id=book_id, day=day, overdue=0, **counts) for (book_id, day), counts in books.items()
+    ])
+    session.bulk_insert_mappings(UserMonthlyStat, [
+        dict(user_id=user_id, month=month, **counts) for (user_id, month), counts in users.items()
+    ])
+    rebuild_totals(session)
+    snapshot_overdue(session=session)
+
+
+def rebuild_totals(session=None):
+    """Recalcule les cumuls par livre et par usager depuis les agregats periodiques."""
+    session = session or db.session
+    session.query(BookTotalStat).delete(synchronize_session=False)
+    session.query(UserTotalStat).delete(synchronize_session=False)
+    for total_model, model, key in ((BookTotalStat, BookDailyStat, 'book_id'), (UserTotalStat, UserMonthlyStat, 'user_id')):
+        group = getattr(model, key)
+        session.execute(insert(total_model).from_select(
+            [key, *COUNTERS],
+            select(group, *[func.sum(getattr(model, counter)) for counter in COUNTERS]).group_by(group),
+        ))
+    session.commit()
+
+
+def popular_books(limit: int = 5, session=None):
+    """Livres les plus reserves, lus depuis les cumuls par livre (index sur reservations)."""
+    session = session or db.session
+    return (
+        session.query(Book, BookTotalStat.reservations)
+        .join(BookTotalStat, BookTotalStat.book_id == Book.id)
+        .filter(BookTotalStat.reservations > 0)
+        .order_by(BookTotalStat.reservations.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def reservation_totals(session=None) -> tuple[int, int]:
+    """(nombre total de reservations, nombre d'usagers ayant reserve)."""
+    session = session or db.session
+    return session.query(
+        func.coalesce(func.sum(UserTotalStat.reservations), 0),
+        func.count(UserTotalStat.id).filter(UserTotalStat.reservations > 0),
+    ).one()
+
+
+def circulation_series(start: date, end: date, book_id: int | None = None, session=None) -> list[dict]:
+    session = session or db.session
+    query = session.query(
+        BookDailyStat.day,
+        func.sum(BookDailyStat.loans),
+        func.sum(BookDailyStat.returns),
+        func.sum(BookDailyStat.reservations),
+        func.sum(BookDailyStat.overdue),
+    ).filter(BookDailyStat.day >= start, BookDailyStat.day <= end)
+    if book_id is not None:
+        query = query.filter(BookDailyStat.book_id == book_id)
+    rows = query.group_by(BookDailyStat.day).order_by(BookDailyStat.day.asc()).all()
+    return [{
+        'day': day.isoformat(),
+        'loans': loans,
+        'returns': returns,
+        'reservations': reservations,
+        'overdue': overdue
+    } for day, loans, returns, reservations, overdue in rows]
+
+
+def user_series(user_id: int, session=None) -> list[dict]:
+    session = session or db.session
+    rows = session.query(UserMonthlyStat).filter_by(user_id=user_id).order_by(UserMonthlyStat.month.asc()).all()
+    return [{
+        'month': row.month.strftime('%Y-%m'),
+        'loans': row.loans,
+        'returns': row.returns,
+        'reservations': row.reservations
+    } for row in rows]
+
+
+if __name__ == '__main__':
+    from app import create_app, ensure_database
+    app = create_app()
+    ensure_database(app)
+    with app.app_context():
+        if '--rebuild' in sys.argv:
+            rebuild_rollups()
+            print('✓ Agregats de circulation recalcules')
+        else:
+            print(f'✓ {snapshot_overdue()} emprunt(s) en retard releves')
@@ -0,0 +1,244 @@
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, union_all
+from sqlalchemy.exc import IntegrityError
+from models import User, Book, Loan, Reservation, LoanHistory, ApiOperation
+from facets import facet_snapshot, update_facet_counts, AVAILABLE
+from rollups import record_event
+
+# Regles metier de l'API JSON, ecrites contre une Session explicite pour etre
+# partagees entre les routes Flask (db.session) et le mode ASGI asynchrone
+# (AsyncSession.run_sync). Chaque fonction retourne (corps, code HTTP) et ne
+# fait jamais le commit: c'est l'appelant qui valide la transaction.
+#
+# Les listes de l'API (list_books, list_users, list_loans) ne chargent que les
+# colonnes utiles sous forme de tuples et laissent les datetime a l'encodeur
+# JSON (json_provider.py). loan_to_dict et reservation_to_dict, comme
+# book_to_dict et user_to_dict dans app.py, restent la reference de sortie.
+BOOK_FIELDS = ('id', 'title', 'author', 'isbn', 'publisher', 'publication_year', 'language', 'category', 'total_copies')
+USER_FIELDS = ('id', 'name', 'email', 'card_number', 'affiliation', 'registered_on', 'approved', 'is_active')
+LOAN_FIELDS = ('id', 'user_id', 'book_id', 'borrowed_on', 'due_date', 'returned_on', 'returned')
+
+
+def parse_ids(data) -> tuple[int, int] | None:
+    try:
+        return int(data.get('user_id')), int(data.get('book_id'))
+    except Exception:
+        return None
+
+
+def loan_to_dict(l: Loan) -> dict:
+    return {
+        'id': l.id,
+        'user_id': l.user_id,
+        'book_id': l.book_id,
+        'borrowed_on': l.borrowed_on.isoformat(),
+        'due_date': l.due_date.isoformat() if l.due_date else None,
+        'returned_on': l.returned_on.isoformat() if l.returned_on else None,
+        'returned': l.returned
+    }
+
+
+def reservation_to_dict(r: Reservation) -> dict:
+    return {
+        'id': r.id,
+        'user_id': r.user_id,
+        'book_id': r.book_id,
+        'reserved_on': r.reserved_on.isoformat(),
+        'expires_on': r.expires_on.isoformat() if r.expires_on else None,
+        'active': r.active
+    }
+
+
+def _active_loan_counts(column):
+    return (
+        select(column.label('ref_id'), func.count(Loan.id).label('active'))
+        .where(Loan.returned == False)
+        .group_by(column)
+        .subquery()
+    )
+
+
+def list_books(session, limit: int | None = None) -> list[dict]:
+    borrowed = _active_loan_counts(Loan.book_id)
+    query = (
+        select(*[getattr(Book, f) for f in BOOK_FIELDS], func.coalesce(borrowed.c.active, 0))
+        .outerjoin(borrowed, borrowed.c.ref_id == Book.id)
+        .order_by(Book.id)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    books = []
+    for row in session.execute(query):
+        book = dict(zip(BOOK_FIELDS, row))
+        book['available_copies'] = max(0, row[-2] - row[-1])
+        books.append(book)
+    return books
+
+
+def list_users(session) -> list[dict]:
+    loans = _active_loan_counts(Loan.user_id)
+    query = (
+        select(*[getattr(User, f) for f in USER_FIELDS], func.coalesce(loans.c.active, 0))
+        .outerjoin(loans, loans.c.ref_id == User.id)
+        .order_by(User.id)
+    )
+    fields = USER_FIELDS + ('active_loans',)
+    return [dict(zip(fields, row)) for row in session.execute(query)]
+
+
+def list_loans(session) -> list[dict]:
+    """Emprunts en cours et archives (LoanHistory), par id croissant."""
+    query = union_all(
+        select(*[getattr(Loan, f) for f in LOAN_FIELDS]),
+        select(*[getattr(LoanHistory, f) for f in LOAN_FIELDS]),
+    ).order_by('id')
+    return [dict(zip(LOAN_FIELDS, row)) for row in session.execute(query)]
+
+
+def library_stats(session) -> dict:
+    return {
+        'total_books': session.query(func.count(Book.id)).scalar(),
+        'total_users': session.query(func.count(User.id)).scalar(),
+        'active_loans': session.query(func.count(Loan.id)).filter(Loan.returned == False).scalar(),
+        'total_reservations': session.query(func.count(Reservation.id)).filter(Reservation.active == True).scalar()
+    }
+
+
+def _load_user_and_book(session, data):
+    ids = parse_ids(data)
+    if ids is None:
+        return None, None, ({'error': 'user_id and book_id are required integers'}, 400)
+    user = session.get(User, ids[0])
+    book = session.get(Book, ids[1])
+    if not user or not book:
+        return None, None, ({'error': 'user or book not found'}, 404)
+    if not user.approved:
+        return None, None, ({'error': 'user is pending admin approval'}, 403)
+    return user, book, None
+
+
+def borrow(session, data, max_active_loans: int, loan_days: int):
+    user, book, error = _load_user_and_book(session, data)
+    if error:
+        return error
+    before = facet_snapshot(book, session)
+    if before['availability'] != AVAILABLE:
+        return {'error': 'no copies available'}, 400
+    active_loans = session.query(func.count(Loan.id)).filter(Loan.user_id == user.id, Loan.returned == False).scalar()
+    if active_loans >= max_active_loans:
+        return {'error': 'user has reached loan limit'}, 400
+    loan = Loan(user_id=user.id, book_id=book.id, due_date=datetime.utcnow() + timedelta(days=loan_days))
+    session.add(loan)
+    update_facet_counts(before, facet_snapshot(book, session), session)
+    record_event('loans', user.id, book.id, session=session)
+    session.flush()
+    return {'message': 'loan created', 'loan': loan_to_dict(loan)}, 201
+
+
+def reserve(session, data, reservation_days: int):
+    user, book, error = _load_user_and_book(session, data)
+    if error:
+        return error
+    existing = session.query(Reservation.id).filter_by(user_id=user.id, book_id=book.id, active=True).first()
+    if existing:
+        return {'error': 'active reservation already exists'}, 400
+    r = Reservation(user_id=user.id, book_id=book.id, expires_on=datetime.utcnow() + timedelta(days=reservation_days))
+    session.add(r)
+    record_event('reservations', user.id, book.id, session=session)
+    session.flush()
+    return {'message': 'reservation created', 'reservation': reservation_to_dict(r)}, 201
+
+
+def return_loan(session, data, loan_days: int):
+    """Retour d'un emprunt; la plus ancienne reservation active du livre devient un emprunt."""
+    try:
+        loan_id = int(data.get('loan_id'))
+    except Exception:
+        return {'error': 'loan_id is a required integer'}, 400
+    loan = session.get(Loan, loan_id)
+    if not loan:
+        return {'error': 'loan not found'}, 404
+    if loan.returned:
+        return {'error': 'loan already returned'}, 400
+    book = session.get(Book, loan.book_id)
+    before = facet_snapshot(book, session)
+    loan.returned = True
+    loan.returned_on = datetime.utcnow()
+    record_event('returns', loan.user_id, book.id, session=session)
+    body = {'message': 'loan returned', 'loan': loan_to_dict(loan)}
+    next_res = (
+        session.query(Reservation)
+        .filter_by(book_id=book.id, active=True)
+        .order_by(Reservation.reserved_on.asc())
+        .first()
+    )
+    if next_res and facet_snapshot(book, session)['availability'] == AVAILABLE:
+        new_loan = Loan(user_id=next_res.user_id, book_id=book.id, due_date=datetime.utcnow() + timedelta(days=loan_days))
+        next_res.active = False
+        session.add(new_loan)
+        record_event('loans', next_res.user_id, book.id, session=session)
+        session.flush()
+        body['fulfilled_reservation'] = reservation_to_dict(next_res)
+        body['new_loan'] = loan_to_dict(new_loan)
+    update_facet_counts(before, facet_snapshot(book, session), session)
+    session.flush()
+    return body, 200
+
+
+def begin_batch(session):
+    """Ouvre la transaction d'une tranche de lot, avant le premier apply_operation.
+
+    pysqlite et aiosqlite n'envoient pas de BEGIN avant un SAVEPOINT: sans
+    transaction ouverte, le RELEASE de chaque operation serait ecrit aussitot
+    et la tranche ne serait pas atomique. BEGIN IMMEDIATE prend aussi le
+    verrou d'ecriture des le depart. Les autres bases ouvrent deja leur
+    transaction d'elles-memes.
+    """
+    connection = session.connection()
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def apply_operation(session, op, max_active_loans: int, loan_days: int, reservation_days: int) -> dict:
+    """Applique une operation de lot dans un SAVEPOINT et enregistre sa cle d'idempotence.
+
+    Une cle deja connue renvoie le resultat enregistre sans rien reappliquer.
+    Les echecs ne sont pas enregistres: le client peut reessayer avec la meme cle.
+    """
+    key = op.get('key') if isinstance(op, dict) else None
+    if not isinstance(key, str) or not key or len(key) > 100:
+        return {'key': key, 'status': 400, 'body': {'error': 'key must be a non-empty string of at most 100 characters'}}
+    handlers = {
+        'borrow': lambda: borrow(session, op, max_active_loans, loan_days),
+        'reserve': lambda: reserve(session, op, reservation_days),
+        'return': lambda: return_loan(session, op, loan_days),
+    }
+    handler = handlers.get(op.get('type'))
+    if handler is None:
+        return {'key': key, 'status': 400, 'body': {'error': 'type must be borrow, reserve or return'}}
+    stored = session.query(ApiOperation).filter_by(key=key).first()
+    if stored is None:
+        savepoint = session.begin_nested()
+        body, status = handler()
+        if status >= 400:
+            savepoint.rollback()
+            return {'key': key, 'status': status, 'body': body}
+        try:
+            session.add(ApiOperation(key=key, operation=op['type'], status=status, response=json.dumps(body)))
+            savepoint.commit()
+            return {'key': key, 'status': status, 'body': body}
+        except IntegrityError:
+            # Meme cle appliquee en parallele par une autre requete: on renvoie son resultat.
+            savepoint.rollback()
+            stored = session.query(ApiOperation).filter_by(key=key).first()
+    return {'key': key, 'status': stored.status, 'body': json.loads(stored.response), 'replayed': True}
+
+
+def batch_summary(results: list[dict]) -> dict:
+    return {
+        'results': results,
+        'applied': sum(1 for r in results if r['status'] < 400 and not r.get('replayed')),
+        'replayed': sum(1 for r in results if r.get('replayed')),
+        'failed': sum(1 for r in results if r['status'] >= 400)
+    }
@@ -0,0 +1,58 @@
+import os
+from db_routing import REPLICA_BIND
+
+# Configuration de l'application, lue dans l'environnement au moment de
+# create_app() (et non a l'import), pour qu'un script ou un test puisse la
+# surcharger: create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}).
+
+
+def normalize_database_url(url: str) -> str:
+    if url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+
+def default_settings(instance_path: str) -> dict:
+    env = os.environ.get
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': normalize_database_url(env('DATABASE_URL', 'sqlite:///library.db')),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SECRET_KEY': env('SECRET_KEY', 'dev-secret-key-change-in-production'),
+        'REPLICA_STICKY_SECONDS': int(env('REPLICA_STICKY_SECONDS', '5')),
+        # Admin password (à changer en production)
+        'ADMIN_PASSWORD': env('ADMIN_PASSWORD', 'Hermann48'),
+        'LOAN_EXTENSION_DAYS': int(env('LOAN_EXTENSION_DAYS', '7')),
+        'RESERVATION_EXTENSION_DAYS': int(env('RESERVATION_EXTENSION_DAYS', '7')),
+        'MAX_ACTIVE_LOANS': int(env('MAX_ACTIVE_LOANS', '5')),
+        'DEFAULT_LOAN_DAYS': int(env('DEFAULT_LOAN_DAYS', '14')),
+        'DEFAULT_RESERVATION_DAYS': int(env('DEFAULT_RESERVATION_DAYS', '7')),
+        'SUGGEST_INDEX_TTL': int(env('SUGGEST_INDEX_TTL', '300')),
+        'SUGGEST_MAX_RESULTS': 20,
+        'SIMILAR_BOOKS_SHOWN': 5,
+        'CHANGES_MAX_LIMIT': 1000,
+        # Hors SQLite: age minimal (secondes) d'un evenement servi par /api/changes (voir changefeed.py)
+        'CHANGES_COMMIT_LAG': float(env('CHANGES_COMMIT_LAG', '5')),
+        'AUDIT_PAGE_SIZE': 100,
+        'BOOKS_PER_PAGE': int(env('BOOKS_PER_PAGE', '50')),
+        'PROFILE_PAGE_SIZE': int(env('PROFILE_PAGE_SIZE', '10')),
+        'BULK_MAX_OPERATIONS': 1000,
+        'BULK_CHUNK_SIZE': int(env('BULK_CHUNK_SIZE', '100')),
+        # Fichiers d'archive du journal d'audit (voir audit_log.py)
+        'AUDIT_ARCHIVE_DIR': env('AUDIT_ARCHIVE_DIR', os.path.join(instance_path, 'audit_archive')),
+        # Controle d'admission des routes qui ecrivent (voir admission.py): debits en requetes/seconde
+        'ADMISSION_ENABLED': env('ADMISSION_ENABLED', '1') == '1',
+        'ADMISSION_STATE_PATH': env('ADMISSION_STATE_PATH', os.path.join(instance_path, 'admission.sqlite')),
+        'ADMISSION_CLIENT_RATE': float(env('ADMISSION_CLIENT_RATE', '5')),
+        'ADMISSION_CLIENT_BURST': float(env('ADMISSION_CLIENT_BURST', '20')),
+        'ADMISSION_GLOBAL_RATE': float(env('ADMISSION_GLOBAL_RATE', '50')),
+        'ADMISSION_GLOBAL_BURST': float(env('ADMISSION_GLOBAL_BURST', '100')),
+        'ADMISSION_MAX_WAIT': float(env('ADMISSION_MAX_WAIT', '2')),
+        # Nombre de proxys de confiance devant l'application (1 sur Render): l'adresse
+        # du client est alors lue dans X-Forwarded-For. 0 = en-tetes ignores.
+        'PROXY_FIX_X_FOR': int(env('PROXY_FIX_X_FOR', '0')),
+    }
+    # Replique en lecture optionnelle (ex: deux fichiers SQLite en local pour tester)
+    replica_url = env('DATABASE_REPLICA_URL')
+    if replica_url:
+        settings['SQLALCHEMY_BINDS'] = {REPLICA_BIND: normalize_database_url(replica_url)}
+    return settings
@@ -0,0 +1,76 @@
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Rapport de demarrage: ou passe le temps entre le lancement de l'interpreteur
+# et la premiere reponse servie.
+#   python startup_report.py                 (un demarrage a froid)
+#   python startup_report.py --preload       (comme un worker gunicorn --preload)
+#   python startup_report.py --repeat 5      (mediane de 5 processus neufs)
+# Les phases import_* mesurent l'import des bibliotheques puis de app.py; les
+# phases config/extensions/blueprints viennent de create_app(); database est
+# la preparation de la base (db_setup.py); first_request et next_request
+# mesurent deux GET successifs sur --path.
+
+
+def measure(path: str, preload: bool) -> dict:
+    timings = {}
+    started = time.perf_counter()
+    import flask, flask_sqlalchemy, sqlalchemy.orm  # noqa: F401
+    timings['import_libraries'] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    import app as app_module
+    timings['import_app'] = round((time.perf_counter() - started) * 1000, 1)
+
+    app = app_module.create_app()
+    if preload:
+        app_module.warm_up(app)
+    else:
+        app_module.ensure_database(app)
+    timings.update(app.extensions['startup_timings'])
+
+    client = app.test_client()
+    for name in ('first_request', 'next_request'):
+        started = time.perf_counter()
+        status = client.get(path).status_code
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    timings['status'] = status
+    timings['total'] = round((time.perf_counter() - _STARTED) * 1000, 1)
+    return timings
+
+
+def print_report(timings: dict, title: str):
+    print(title)
+    for phase, ms in timings.items():
+        if phase != 'status':
+            print(f'  {phase:<18} {ms:>9.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Decompose le cout du demarrage de l application')
+    parser.add_argument('--path', default='/', help='URL de la premiere requete (defaut: /)')
+    parser.add_argument('--preload', action='store_true', help='prechauffe comme gunicorn --preload avant la premiere requete')
+    parser.add_argument('--repeat', type=int, default=1, help='nombre de processus neufs a mesurer')
+    parser.add_argument('--json', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.repeat <= 1:
+        timings = measure(args.path, args.preload)
+        if args.json:
+            print(json.dumps(timings))
+        else:
+            print_report(timings, f"Demarrage ({'preload' if args.preload else 'a froid'}), GET {args.path} -> {timings['status']}")
+        sys.exit(0)
+
+    # Chaque mesure dans un interpreteur neuf: les imports ne sont pas deja en cache.
+    command = [sys.executable, __file__, '--json', '--path', args.path] + (['--preload'] if args.preload else [])
+    runs = [json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout) for _ in range(args.repeat)]
+    medians = {phase: statistics.median(run[phase] for run in runs) for phase in runs[0] if phase != 'status'}
+    print_report(medians, f"Mediane de {args.repeat} demarrages ({'preload' if args.preload else 'a froid'}), GET {args.path}")
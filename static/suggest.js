@@ -0,0 +1,55 @@
+// Autocompletion des formulaires admin via /api/suggest
+function initTypeahead(input) {
+    const kind = input.dataset.suggest;
+    const hidden = document.getElementById(input.dataset.target);
+    const datalist = document.getElementById(input.getAttribute('list'));
+    let labels = {};
+    let timer = null;
+
+    function selectFromLabel() {
+        hidden.value = labels[input.value] || '';
+    }
+
+    async function refresh() {
+        const q = input.value.trim();
+        if (!q) {
+            datalist.innerHTML = '';
+            return;
+        }
+        try {
+            const response = await fetch(`/api/suggest?type=${kind}&q=${encodeURIComponent(q)}&limit=10`);
+            if (!response.ok) return;
+            const items = await response.json();
+            labels = {};
+            datalist.innerHTML = '';
+            items.forEach(item => {
+                labels[item.label] = item.id;
+                const option = document.createElement('option');
+                option.value = item.label;
+                datalist.appendChild(option);
+            });
+            selectFromLabel();
+        } catch (error) {
+            console.error('Erreur lors de l autocompletion:', error);
+        }
+    }
+
+    input.addEventListener('input', function() {
+        selectFromLabel();
+        clearTimeout(timer);
+        timer = setTimeout(refresh, 150);
+    });
+    input.addEventListener('change', selectFromLabel);
+    input.form.addEventListener('submit', function(event) {
+        if (!hidden.value) {
+            event.preventDefault();
+            input.setCustomValidity('Choisissez une entree dans la liste');
+            input.reportValidity();
+        }
+    });
+    input.addEventListener('input', () => input.setCustomValidity(''));
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[data-suggest]').forEach(initTypeahead);
+});
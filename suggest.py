@@ -0,0 +1,194 @@
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from threading import Lock, Thread
+from flask import current_app
+from models import Book, User
+
+# Index de prefixes en memoire pour l'autocompletion (/api/suggest).
+# Chaque processus (worker gunicorn) possede son propre index: il est construit
+# au demarrage (tri unique de toutes les cles), mis a jour lors des
+# ajouts/suppressions faits par ce processus, et reconstruit en arriere-plan
+# apres SUGGEST_INDEX_TTL secondes pour rattraper les modifications faites par
+# les autres workers; les requetes continuent d'utiliser l'ancien index
+# pendant la reconstruction, et les ajouts/suppressions faits entre-temps sont
+# rejoues sur le nouvel index avant l'echange.
+# Les resultats sont classes: cle identique a la saisie, puis libelle qui
+# commence par la saisie, puis mot du libelle; a egalite le plus court.
+SEARCH_CANDIDATES = 200
+
+
+def normalize(value: str | None) -> str:
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower().strip()
+
+
+class PrefixIndex:
+    """Liste triee de (cle, id) interrogee par bisection."""
+
+    def __init__(self):
+        self._keys = []
+        self._labels = {}
+        self._entry_keys = {}
+
+    def __len__(self):
+        return len(self._labels)
+
+    @staticmethod
+    def _keys_for(terms) -> set:
+        keys = set()
+        for term in terms:
+            term = normalize(term)
+            if not term:
+                continue
+            keys.add(term)
+            # Chaque mot est aussi indexe pour trouver "tolkien" dans "J.R.R. Tolkien".
+            keys.update(word for word in term.split() if len(word) > 1)
+        return keys
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Construction en bloc depuis des (id, libelle, termes): un seul tri."""
+        index = cls()
+        for entry_id, label, terms in entries:
+            keys = cls._keys_for(terms)
+            index._keys.extend((key, entry_id) for key in keys)
+            index._labels[entry_id] = label
+            index._entry_keys[entry_id] = keys
+        index._keys.sort()
+        return index
+
+    def add(self, entry_id: int, label: str, terms):
+        self.remove(entry_id)
+        keys = self._keys_for(terms)
+        for key in keys:
+            insort(self._keys, (key, entry_id))
+        self._labels[entry_id] = label
+        self._entry_keys[entry_id] = keys
+
+    def remove(self, entry_id: int):
+        for key in self._entry_keys.pop(entry_id, ()):
+            pos = bisect_left(self._keys, (key, entry_id))
+            if pos < len(self._keys) and self._keys[pos] == (key, entry_id):
+                del self._keys[pos]
+        self._labels.pop(entry_id, None)
+
+    def search(self, prefix: str, limit: int = 10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        # Rang par entree: 0 = une cle egale a la saisie, 1 = une autre cle.
+        ranks = {}
+        pos = bisect_left(self._keys, (prefix,))
+        end = min(len(self._keys), pos + max(SEARCH_CANDIDATES, limit))
+        while pos < end:
+            key, entry_id = self._keys[pos]
+            if not key.startswith(prefix):
+                break
+            ranks[entry_id] = min(ranks.get(entry_id, 1), 0 if key == prefix else 1)
+            pos += 1
+
+        def rank(entry_id):
+            label = self._labels[entry_id]
+            return ranks[entry_id], not normalize(label).startswith(prefix), len(label), label
+
+        return [{'id': entry_id, 'label': self._labels[entry_id]} for entry_id in sorted(ranks, key=rank)[:limit]]
+
+
+def book_label(book: Book) -> str:
+    return f'{book.title} - {book.author}' if book.author else book.title
+
+
+def user_label(user: User) -> str:
+    return f'{user.name} ({user.email})'
+
+
+class SuggestIndex:
+    def __init__(self, ttl: int = 300):
+        self.ttl = ttl
+        self.books = PrefixIndex()
+        self.users = PrefixIndex()
+        self._built_at = None
+        self._lock = Lock()
+        # Mises a jour recues pendant une reconstruction (None hors reconstruction).
+        self._pending = None
+        # Une seule reconstruction a la fois par processus.
+        self._build_lock = Lock()
+
+    def build(self):
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        with self._lock:
+            self._pending = []
+        try:
+            books = PrefixIndex.from_entries(
+                (book.id, book_label(book), (book.title, book.author, book.isbn))
+                for book in Book.query.with_entities(Book.id, Book.title, Book.author, Book.isbn).yield_per(1000)
+            )
+            approved = User.query.with_entities(User.id, User.name, User.email, User.card_number).filter_by(approved=True, is_active=True)
+            users = PrefixIndex.from_entries(
+                (user.id, user_label(user), (user.name, user.email, user.card_number))
+                for user in approved.yield_per(1000)
+            )
+            with self._lock:
+                # add/remove sont idempotents: rejouer une modification deja lue en base est sans effet.
+                for kind, method, args in self._pending:
+                    getattr(users if kind == 'user' else books, method)(*args)
+                self.books, self.users = books, users
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def _rebuild_in_background(self, app):
+        try:
+            with app.app_context():
+                self._build()
+        finally:
+            self._build_lock.release()
+
+    def refresh(self):
+        """Premier appel: construit l'index. Ensuite, s'il a expire, lance une
+        reconstruction en arriere-plan (sauf si une est deja en cours)."""
+        if self._built_at is None:
+            with self._build_lock:
+                if self._built_at is None:
+                    self._build()
+        elif self._is_stale() and self._build_lock.acquire(blocking=False):
+            try:
+                Thread(target=self._rebuild_in_background, args=(current_app._get_current_object(),), daemon=True).start()
+            except BaseException:
+                self._build_lock.release()
+                raise
+
+    def _is_stale(self):
+        return self._built_at is None or time.monotonic() - self._built_at >= self.ttl
+
+    def _update(self, kind: str, method: str, *args):
+        with self._lock:
+            if self._built_at is not None:
+                getattr(self.users if kind == 'user' else self.books, method)(*args)
+            if self._pending is not None:
+                self._pending.append((kind, method, args))
+
+    def add_book(self, book: Book):
+        self._update('book', 'add', book.id, book_label(book), (book.title, book.author, book.isbn))
+
+    def remove_book(self, book_id: int):
+        self._update('book', 'remove', book_id)
+
+    def add_user(self, user: User):
+        self._update('user', 'add', user.id, user_label(user), (user.name, user.email, user.card_number))
+
+    def remove_user(self, user_id: int):
+        self._update('user', 'remove', user_id)
+
+    def search(self, kind: str, prefix: str, limit: int = 10):
+        self.refresh()
+        with self._lock:
+            index = self.users if kind == 'user' else self.books
+            return index.search(prefix, limit)
@@ -0,0 +1,68 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, ensure_database  # noqa: E402
+from models import db, User  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'library.db'}",
+        'ADMISSION_ENABLED': False,
+        'ADMISSION_STATE_PATH': str(tmp_path / 'admission.sqlite'),
+    })
+    ensure_database(app)
+    with app.app_context():
+        db.session.add_all([
+            User(name=f'Usager {i}', email=f'usager{i}@example.com', card_number=f'CARD-TEST-{i:04d}', approved=True)
+            for i in range(1, 4)
+        ])
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def database_path(app):
+    return app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def run_concurrently(app):
+    """run_concurrently(work): `threads` threads appellent work() puis commit, `repeat` fois chacun."""
+    def run(work, threads=8, repeat=10):
+        errors = []
+
+        def worker():
+            try:
+                with app.app_context():
+                    for _ in range(repeat):
+                        work()
+                        db.session.commit()
+            except Exception as exc:  # remonte dans le thread principal
+                errors.append(exc)
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    return run
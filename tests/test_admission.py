@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+from admission import admit_request, client_key
+from app import create_app
+
+
+@pytest.mark.parametrize('proxies, expected', [(0, 'ip:10.0.0.1'), (1, 'ip:203.0.113.7')])
+def test_client_key_uses_the_trusted_forwarded_address(tmp_path, proxies, expected):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'library.db'}",
+        'ADMISSION_STATE_PATH': str(tmp_path / 'admission.sqlite'),
+        'PROXY_FIX_X_FOR': proxies,
+    })
+    app.extensions['database_ready'] = True
+    app.add_url_rule('/client-key', 'client_key', client_key)
+    response = app.test_client().get(
+        '/client-key',
+        environ_base={'REMOTE_ADDR': '10.0.0.1'},
+        headers={'X-Forwarded-For': '198.51.100.1, 203.0.113.7'},
+    )
+    assert response.get_data(as_text=True) == expected
+
+
+def test_admission_counters_require_an_admin_session(client):
+    assert client.get('/api/admission').status_code == 403
+    with client.session_transaction() as session:
+        session['admin'] = True
+    assert client.get('/api/admission').status_code == 200
+
+
+def test_locked_state_file_is_a_clean_503(app, client):
+    app.before_request(admit_request)
+    controller = app.extensions['admission']
+    controller._connection().execute('PRAGMA busy_timeout = 0')
+    # Un autre worker garde le verrou d'ecriture du fichier d'etat.
+    other = sqlite3.connect(app.config['ADMISSION_STATE_PATH'], isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    try:
+        response = client.post('/api/borrow', json={})
+    finally:
+        other.execute('ROLLBACK')
+        other.close()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert not controller._connection().in_transaction
@@ -0,0 +1,55 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import api
+import archive
+import json_provider
+from models import db, Book, Loan, LoanHistory, User
+from services import loan_to_dict
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def json_backend(request, monkeypatch):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    return request.param
+
+
+@pytest.fixture
+def library(app):
+    with app.app_context():
+        now = datetime.utcnow().replace(microsecond=123456)
+        long_ago = now - timedelta(days=400)
+        db.session.add(Book(title='Sans auteur', total_copies=1, publication_year=1999, language='Français', category='Roman'))
+        db.session.add_all([
+            # Dates avec et sans microsecondes, echeance et retour absents.
+            Loan(user_id=1, book_id=1, borrowed_on=long_ago.replace(microsecond=0), due_date=long_ago, returned=True, returned_on=long_ago),
+            Loan(user_id=2, book_id=2, borrowed_on=long_ago, due_date=None, returned=True, returned_on=long_ago),
+            Loan(user_id=1, book_id=3, borrowed_on=now, due_date=now + timedelta(days=14), returned=False),
+            Loan(user_id=3, book_id=1, borrowed_on=now, due_date=None, returned=False, returned_on=None),
+        ])
+        db.session.commit()
+        archive.archive_closed(older_than_days=180)
+        assert LoanHistory.query.count() == 2
+    return app
+
+
+def reference(app, path):
+    with app.test_request_context():
+        if path == '/api/books':
+            return [api.book_to_dict(book) for book in Book.query.order_by(Book.id)]
+        if path == '/api/users':
+            return [api.user_to_dict(user) for user in User.query.order_by(User.id)]
+        loans = Loan.query.all() + LoanHistory.query.all()
+        return [loan_to_dict(loan) for loan in sorted(loans, key=lambda loan: loan.id)]
+
+
+@pytest.mark.parametrize('path', ['/api/books', '/api/users', '/api/loans'])
+def test_column_path_matches_reference_serializers(library, client, json_backend, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert json.loads(response.data) == json.loads(json.dumps(reference(library, path)))
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+import archive
+from db_setup import sqlite_enable_autoincrement
+from models import db, Loan, LoanHistory
+
+
+def returned_loan(user_id=1, book_id=1):
+    long_ago = datetime.utcnow() - timedelta(days=400)
+    return Loan(user_id=user_id, book_id=book_id, borrowed_on=long_ago, due_date=long_ago, returned=True, returned_on=long_ago)
+
+
+def test_archived_ids_are_never_reused(app):
+    with app.app_context():
+        db.session.add_all([returned_loan() for _ in range(3)])
+        db.session.commit()
+        assert archive.archive_closed(older_than_days=180) == (3, 0)
+        assert Loan.query.count() == 0
+
+        loan = returned_loan()
+        db.session.add(loan)
+        db.session.commit()
+        assert loan.id not in {row.id for row in LoanHistory.query}
+
+
+def test_existing_table_is_rebuilt_with_autoincrement(app):
+    with app.app_context():
+        # Schema d'avant: table loan sans AUTOINCREMENT, dernier id deja archive.
+        db.session.execute(text("DROP TABLE loan"))
+        db.session.execute(text(
+            "CREATE TABLE loan (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, book_id INTEGER NOT NULL, "
+            "borrowed_on DATETIME, due_date DATETIME, returned BOOLEAN)"
+        ))
+        db.session.execute(text("INSERT INTO loan (id, user_id, book_id, returned) VALUES (1, 1, 1, 0)"))
+        db.session.execute(text("INSERT INTO loan_history (id, user_id, book_id, returned, archived_on) VALUES (7, 1, 1, 1, CURRENT_TIMESTAMP)"))
+        db.session.commit()
+
+        sqlite_enable_autoincrement(Loan, LoanHistory)
+        sqlite_enable_autoincrement(Loan, LoanHistory)
+
+        ddl = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'loan'")).scalar()
+        assert 'AUTOINCREMENT' in ddl and 'returned_on' in ddl
+        assert [(loan.id, loan.returned_on) for loan in Loan.query] == [(1, None)]
+        loan = returned_loan()
+        db.session.add(loan)
+        db.session.commit()
+        assert loan.id == 8
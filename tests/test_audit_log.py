@@ -0,0 +1,74 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import audit_log
+from models import db, AuditLog
+
+
+def add_logs(ids, days_ago=200):
+    created_on = datetime.utcnow().replace(hour=12) - timedelta(days=days_ago)
+    db.session.add_all([
+        AuditLog(id=log_id, actor_type='admin', action='LOAN_RETURNED', entity_type='loan', entity_id=log_id, payload='{}', created_on=created_on)
+        for log_id in ids
+    ])
+    db.session.commit()
+
+
+def archived(archive_dir):
+    ids = []
+    for filename in sorted(os.listdir(archive_dir)):
+        assert filename.endswith('.jsonl.gz'), filename
+        with gzip.open(os.path.join(archive_dir, filename), 'rt', encoding='utf-8') as f:
+            ids.extend(json.loads(line)['id'] for line in f)
+    return ids
+
+
+def test_rotate_after_an_interrupted_delete_does_not_duplicate(app, tmp_path, monkeypatch):
+    archive_dir = str(tmp_path / 'audit')
+    write_part = audit_log.write_part
+    calls = []
+
+    def crash_after_second_part(path, entries):
+        write_part(path, entries)
+        calls.append(path)
+        if len(calls) == 2:
+            raise KeyboardInterrupt  # arret entre l'ecriture du fichier et la suppression des lignes
+
+    with app.app_context():
+        add_logs(range(1, 6))
+        monkeypatch.setattr(audit_log, 'write_part', crash_after_second_part)
+        with pytest.raises(KeyboardInterrupt):
+            audit_log.rotate(archive_dir, keep_days=90, batch_size=2)
+        db.session.rollback()
+        assert AuditLog.query.count() == 3
+        written = {name: os.stat(os.path.join(archive_dir, name)).st_mtime_ns for name in os.listdir(archive_dir)}
+
+        monkeypatch.setattr(audit_log, 'write_part', write_part)
+        assert audit_log.rotate(archive_dir, keep_days=90, batch_size=2) == 3
+        assert AuditLog.query.count() == 0
+    assert archived(archive_dir) == [1, 2, 3, 4, 5]
+    # Les fichiers deja ecrits ne sont jamais reecrits.
+    assert all(os.stat(os.path.join(archive_dir, name)).st_mtime_ns == mtime for name, mtime in written.items())
+    assert [entry['id'] for entry in audit_log.search_archive(archive_dir, entity='loan')] == [1, 2, 3, 4, 5]
+
+
+def test_failed_write_keeps_the_previous_file(app, tmp_path, monkeypatch):
+    archive_dir = str(tmp_path / 'audit')
+    with app.app_context():
+        add_logs(range(1, 3))
+        audit_log.rotate(archive_dir, keep_days=90)
+        add_logs(range(3, 5))
+
+        def crash(entry, **kwargs):
+            raise OSError('disque plein')
+
+        monkeypatch.setattr(audit_log.json, 'dumps', crash)
+        with pytest.raises(OSError):
+            audit_log.rotate(archive_dir, keep_days=90)
+        db.session.rollback()
+        assert AuditLog.query.count() == 2
+    assert archived(archive_dir) == [1, 2]
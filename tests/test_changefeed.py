@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+import archive
+import changefeed
+from models import db, ChangeEvent, Loan, LoanHistory, Reservation, ReservationHistory
+
+
+def test_deleting_a_user_tombstones_archived_history(app, client):
+    with app.app_context():
+        long_ago = datetime.utcnow() - timedelta(days=400)
+        db.session.add_all([
+            Loan(user_id=1, book_id=1, borrowed_on=long_ago, due_date=long_ago, returned=True, returned_on=long_ago)
+            for _ in range(2)
+        ] + [
+            Reservation(user_id=1, book_id=2, reserved_on=long_ago, expires_on=long_ago, active=False)
+            for _ in range(2)
+        ])
+        db.session.commit()
+        archive.archive_closed(older_than_days=180)
+        archived = {('loan', row.id) for row in LoanHistory.query} | {('reservation', row.id) for row in ReservationHistory.query}
+        assert len(archived) == 4
+        since = db.session.query(db.func.max(ChangeEvent.seq)).scalar()
+
+    with client.session_transaction() as session:
+        session['admin'] = True
+    assert client.post('/users/1/delete').status_code == 302
+
+    changes = client.get(f'/api/changes?since={since}').get_json()['changes']
+    tombstones = {(change['type'], change['id']) for change in changes if change['deleted']}
+    assert archived <= tombstones
+
+
+def test_recent_events_wait_for_the_commit_horizon(app, client, monkeypatch):
+    with app.app_context():
+        since = db.session.query(db.func.max(ChangeEvent.seq)).scalar()
+        db.session.add(Reservation(user_id=2, book_id=1, reserved_on=datetime.utcnow(), expires_on=datetime.utcnow(), active=True))
+        db.session.commit()
+
+    # Comme sous PostgreSQL: l'ordre des seq n'est pas garanti etre celui des commits.
+    monkeypatch.setattr(changefeed, 'COMMIT_ORDERED_DIALECTS', ())
+    app.config['CHANGES_COMMIT_LAG'] = 60
+    held = client.get(f'/api/changes?since={since}').get_json()
+    assert (held['changes'], held['next_since']) == ([], since)
+
+    app.config['CHANGES_COMMIT_LAG'] = 0
+    served = client.get(f'/api/changes?since={since}').get_json()
+    assert [change['type'] for change in served['changes']] == ['reservation']
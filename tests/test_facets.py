@@ -0,0 +1,18 @@
+import facets
+from models import db, FacetCount
+
+
+def test_concurrent_bumps_are_all_counted(app, run_concurrently):
+    run_concurrently(lambda: facets.update_facet_counts(None, {'category': 'Roman'}))
+    with app.app_context():
+        assert FacetCount.query.filter_by(facet='category', value='Roman').one().count == 80
+
+
+def test_availability_change_moves_one_book(app):
+    with app.app_context():
+        before = dict(facets.facet_counts()['availability'])
+        facets.update_facet_counts({'availability': facets.AVAILABLE}, {'availability': facets.UNAVAILABLE})
+        db.session.commit()
+        after = dict(facets.facet_counts()['availability'])
+        assert after.get(facets.AVAILABLE, 0) == before[facets.AVAILABLE] - 1
+        assert after[facets.UNAVAILABLE] == before.get(facets.UNAVAILABLE, 0) + 1
@@ -0,0 +1,38 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+import overdue_notices
+from models import db, Loan
+
+
+class FlakyOutbox:
+    """Boite d'envoi qui tombe apres `fail_after` envois, comme un processus interrompu."""
+
+    def __init__(self, sent: Counter, fail_after: int | None = None):
+        self.sent, self.fail_after = sent, fail_after
+
+    def deliver(self, loan_id, message):
+        if self.fail_after is not None and sum(self.sent.values()) >= self.fail_after:
+            raise ConnectionError('serveur SMTP injoignable')
+        self.sent[loan_id] += 1
+
+
+def test_resume_does_not_resend_delivered_notices(app, tmp_path):
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+    sent = Counter()
+    with app.app_context():
+        due = datetime.utcnow() - timedelta(days=3)
+        db.session.add_all([Loan(user_id=1 + i % 3, book_id=1, due_date=due, returned=False) for i in range(10)])
+        db.session.commit()
+        template = app.jinja_env.get_template('notices/overdue.txt')
+
+        # Arret au milieu du deuxieme lot de 4.
+        with pytest.raises(ConnectionError):
+            overdue_notices.generate_notices(template, FlakyOutbox(sent, fail_after=6), checkpoint_path, batch_size=4, workers=1)
+        assert overdue_notices.load_checkpoint(checkpoint_path)['last_loan_id'] == 4
+
+        state = overdue_notices.generate_notices(template, FlakyOutbox(sent), checkpoint_path, batch_size=4, workers=1)
+    assert state['done'] and state['sent'] == 10
+    assert sent == Counter(range(1, 11))
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+import profiles
+from models import db, Loan, LoanHistory
+
+
+def test_history_pages_walk_both_tables_in_order(app):
+    with app.app_context():
+        start = datetime(2024, 1, 1)
+        # Meme date pour plusieurs emprunts: l'id departage, y compris entre les deux tables.
+        db.session.add_all([
+            Loan(user_id=1, book_id=1 + i % 2, borrowed_on=start + timedelta(days=i // 2), returned=i != 5, returned_on=start)
+            for i in range(9)
+        ])
+        db.session.add_all([
+            LoanHistory(id=100 + i, user_id=1, book_id=1, borrowed_on=start + timedelta(days=i // 3), returned=True, archived_on=start)
+            for i in range(7)
+        ])
+        db.session.add(Loan(user_id=2, book_id=1, borrowed_on=start, returned=True))
+        db.session.commit()
+        expected = sorted(
+            [(loan.borrowed_on, loan.id) for loan in Loan.query.filter_by(user_id=1, returned=True)]
+            + [(loan.borrowed_on, loan.id) for loan in LoanHistory.query],
+            reverse=True,
+        )
+
+        seen, before = [], None
+        while True:
+            page, cursor = profiles.loan_history_page(1, profiles.parse_history_cursor(before), 4)
+            assert len(page) <= 4
+            seen.extend((row.borrowed_on, row.id) for row in page)
+            if cursor is None:
+                break
+            before = cursor
+        assert seen == expected
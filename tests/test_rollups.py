@@ -0,0 +1,44 @@
+import rollups
+from models import db, BookDailyStat, BookTotalStat, Loan, UserMonthlyStat
+
+
+def test_concurrent_events_are_all_counted(app, run_concurrently):
+    run_concurrently(lambda: rollups.record_event('loans', 1, 1))
+    with app.app_context():
+        assert BookDailyStat.query.filter_by(book_id=1).one().loans == 80
+        assert UserMonthlyStat.query.filter_by(user_id=1).one().loans == 80
+
+
+def test_snapshot_overdue_replaces_the_days_value(app):
+    with app.app_context():
+        rollups.record_event('loans', 1, 1)
+        db.session.commit()
+        assert rollups.snapshot_overdue() == 0
+        row = BookDailyStat.query.filter_by(book_id=1).one()
+        assert (row.loans, row.overdue) == (1, 0)
+
+
+def test_running_totals_match_the_periodic_rollups(app):
+    with app.app_context():
+        for counter, user_id, book_id in [('reservations', 1, 1), ('reservations', 3, 1), ('reservations', 1, 2), ('loans', 2, 2)]:
+            rollups.record_event(counter, user_id, book_id)
+        db.session.commit()
+        live = ([(book.id, count) for book, count in rollups.popular_books()], tuple(rollups.reservation_totals()))
+        assert live == ([(1, 2), (2, 1)], (3, 2))
+
+        rollups.rebuild_totals()
+        assert ([(book.id, count) for book, count in rollups.popular_books()], tuple(rollups.reservation_totals())) == live
+
+
+def test_returning_a_loan_twice_counts_one_return(app, client):
+    with app.app_context():
+        loan = Loan(user_id=1, book_id=1, returned=False)
+        db.session.add(loan)
+        db.session.commit()
+        loan_id = loan.id
+    with client.session_transaction() as session:
+        session['admin'] = True
+    for _ in range(2):
+        assert client.post('/return', data={'loan_id': loan_id}).status_code == 302
+    with app.app_context():
+        assert BookTotalStat.query.filter_by(book_id=1).one().returns == 1
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+import suggest
+from suggest import PrefixIndex, SuggestIndex
+
+
+def test_results_are_ranked():
+    index = PrefixIndex.from_entries((entry_id, label, (label,)) for entry_id, label in [
+        (1, 'The Prince and the Pauper'),
+        (2, 'Prince'),
+        (3, 'Princesse Mononoke'),
+        (4, 'Le Petit Prince'),
+        (5, 'Aprince'),
+    ])
+    assert [hit['id'] for hit in index.search('Prince')] == [2, 4, 1, 3]
+    assert [hit['id'] for hit in index.search('prin', limit=2)] == [2, 3]
+
+
+def test_updates_during_a_rebuild_are_kept(app, monkeypatch):
+    index = SuggestIndex()
+    from_entries = PrefixIndex.from_entries
+    late_book = SimpleNamespace(id=999, title='Zebulon', author=None, isbn=None)
+
+    def slow_from_entries(entries):
+        built = from_entries(entries)
+        if not calls:
+            # Modifications faites par ce worker pendant la lecture de la base.
+            index.add_book(late_book)
+            index.remove_book(1)
+        calls.append(built)
+        return built
+
+    calls = []
+    with app.app_context():
+        index.build()
+        assert [hit['id'] for hit in index.search('book', 'petit')] == [1]
+        calls.clear()
+        monkeypatch.setattr(suggest.PrefixIndex, 'from_entries', slow_from_entries)
+        index.build()
+        assert [hit['id'] for hit in index.search('book', 'zebu')] == [999]
+        assert index.search('book', 'petit') == []
@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+import services
+from models import db, ApiOperation, Reservation
+
+
+def operation(key, book_id, user_id=1):
+    return {'key': key, 'type': 'reserve', 'user_id': user_id, 'book_id': book_id}
+
+
+def count_rows(database_path, table):
+    connection = sqlite3.connect(database_path)
+    try:
+        return connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_savepoint_release_does_not_commit_the_chunk(app, database_path):
+    with app.app_context():
+        services.begin_batch(db.session)
+        result = services.apply_operation(db.session, operation('k1', 1), 5, 14, 7)
+        assert result['status'] == 201
+        assert count_rows(database_path, 'api_operation') == 0
+        db.session.rollback()
+        assert ApiOperation.query.count() == 0
+        assert Reservation.query.count() == 0
+
+
+def test_failing_chunk_is_rolled_back_as_a_whole(app, client, database_path, monkeypatch):
+    app.config['BULK_CHUNK_SIZE'] = 2
+    apply_operation = services.apply_operation
+
+    def fail_on_k3(session, op, *args):
+        if op['key'] == 'k3':
+            raise RuntimeError('crash au milieu de la deuxieme tranche')
+        return apply_operation(session, op, *args)
+
+    monkeypatch.setattr(services, 'apply_operation', fail_on_k3)
+    operations = [operation('k1', 1), operation('k2', 2), operation('k4', 1, user_id=2), operation('k3', 2, user_id=2)]
+    with pytest.raises(RuntimeError):
+        client.post('/api/transactions', json=operations)
+
+    # La premiere tranche est validee, la seconde (k4 deja applique, puis k3 en echec) ne laisse rien.
+    with app.app_context():
+        db.session.remove()
+        assert sorted(op.key for op in ApiOperation.query) == ['k1', 'k2']
+    assert count_rows(database_path, 'reservation') == 2
+
+
+def test_replayed_batch_applies_nothing_twice(client):
+    operations = [operation('k1', 1), operation('k2', 2)]
+    first = client.post('/api/transactions', json=operations).get_json()
+    second = client.post('/api/transactions', json=operations).get_json()
+    assert (first['applied'], first['replayed']) == (2, 0)
+    assert (second['applied'], second['replayed']) == (0, 2)
+    assert [r['body'] for r in second['results']] == [r['body'] for r in first['results']]
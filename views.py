@@ -0,0 +1,732 @@
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, session
+from models import db, User, Book, Loan, Reservation, LoanHistory, ReservationHistory, AuditLog
+from facets import facet_snapshot, update_facet_counts, facet_counts, filter_books, available_copies_map
+from datetime import datetime, timedelta
+from functools import wraps
+import json
+import secrets
+from db_routing import read_replica
+import rollups
+from recommendations import similar_books
+import changefeed
+import archive
+import profiles
+import audit_log
+
+# Pages HTML du guichet et du portail usager. Le blueprint est enregistre par
+# create_app() (app.py); les constantes metier sont lues dans current_app.config.
+main = Blueprint('main', __name__)
+
+# Décorateur pour vérifier si l'utilisateur est admin
+def login_required_admin(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'admin' not in session:
+            flash('Vous devez être connecté en tant qu\'administrateur', 'warning')
+            return redirect(url_for('main.admin_login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def user_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user_id = session.get('user_id')
+        if not user_id:
+            flash('Veuillez vous connecter en tant qu usager', 'warning')
+            return redirect(url_for('main.user_login'))
+        user = User.query.get(user_id)
+        if not user:
+            session.pop('user_id', None)
+            flash('Compte usager introuvable', 'danger')
+            return redirect(url_for('main.user_login'))
+        if not user.is_active:
+            flash('Compte usager inactif. Contactez l administration', 'danger')
+            return redirect(url_for('main.user_login'))
+        if not user.approved:
+            flash('Compte en attente de validation par l administration', 'warning')
+            return redirect(url_for('main.user_pending'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def generate_card_number() -> str:
+    year = datetime.utcnow().year
+    return f"CARD-{year}-{secrets.token_hex(4).upper()}"
+
+def log_action(actor_type: str, actor_id: int | None, action: str, entity_type: str, entity_id: int | None, payload: dict | None = None):
+    entry = AuditLog(
+        actor_type=actor_type,
+        actor_id=actor_id,
+        action=action,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        payload=json.dumps(payload, ensure_ascii=True) if payload else None
+    )
+    db.session.add(entry)
+
+@main.route('/')
+@read_replica
+def index():
+    books = Book.query.all()
+    total_books = Book.query.count()
+    total_users = User.query.count()
+    active_loans = Loan.query.filter_by(returned=False).count()
+    return render_template('index.html', 
+                         books=books,
+                         total_books=total_books,
+                         total_users=total_users,
+                         active_loans=active_loans)
+
+@main.route('/admin/login', methods=['GET', 'POST'])
+def admin_login():
+    if request.method == 'POST':
+        password = request.form.get('password', '')
+        if password == current_app.config['ADMIN_PASSWORD']:
+            session['admin'] = True
+            flash('✓ Connecté en tant qu\'administrateur', 'success')
+            return redirect(request.referrer or url_for('main.users'))
+        else:
+            flash('❌ Mot de passe incorrect', 'danger')
+            return redirect(url_for('main.admin_login'))
+    return render_template('admin_login.html')
+
+@main.route('/admin/logout')
+def admin_logout():
+    session.pop('admin', None)
+    flash('✓ Déconnecté', 'success')
+    return redirect(url_for('main.index'))
+
+@main.route('/usager/inscription', methods=['GET', 'POST'])
+def user_register():
+    if request.method == 'POST':
+        name = request.form.get('name', '').strip()
+        email = request.form.get('email', '').strip().lower()
+        if not name or not email:
+            flash('Nom et email obligatoires', 'danger')
+            return redirect(url_for('main.user_register'))
+
+        existing_user = User.query.filter_by(email=email).first()
+        if existing_user:
+            if existing_user.approved:
+                flash('Compte deja valide. Connectez-vous avec votre email', 'success')
+                return redirect(url_for('main.user_login'))
+            flash('Inscription deja recue. En attente de validation admin', 'warning')
+            return redirect(url_for('main.user_pending', email=email))
+
+        new_user = User(
+            name=name,
+            email=email,
+            card_number=generate_card_number(),
+            affiliation='Public',
+            approved=False,
+            is_active=True
+        )
+        db.session.add(new_user)
+        db.session.commit()
+        log_action('user', new_user.id, 'REGISTER_REQUESTED', 'user', new_user.id, {'email': new_user.email})
+        db.session.commit()
+        flash('Demande d inscription enregistree. Validation admin requise', 'success')
+        return redirect(url_for('main.user_pending', email=email))
+    return render_template('user_register.html')
+
+@main.route('/usager/connexion', methods=['GET', 'POST'])
+def user_login():
+    if request.method == 'POST':
+        email = request.form.get('email', '').strip().lower()
+        if not email:
+            flash('Email obligatoire', 'danger')
+            return redirect(url_for('main.user_login'))
+
+        user = User.query.filter_by(email=email).first()
+        if not user:
+            flash('Aucun compte trouve. Faites d abord une inscription', 'warning')
+            return redirect(url_for('main.user_register'))
+        if not user.is_active:
+            flash('Compte inactif. Contactez l administration', 'danger')
+            return redirect(url_for('main.user_login'))
+
+        session['user_id'] = user.id
+        if not user.approved:
+            flash('Compte en attente de validation par l administration', 'warning')
+            return redirect(url_for('main.user_pending'))
+
+        flash('Connexion usager reussie', 'success')
+        return redirect(url_for('main.user_portal'))
+    return render_template('user_login.html')
+
+@main.route('/usager/deconnexion')
+def user_logout():
+    session.pop('user_id', None)
+    flash('Vous etes deconnecte', 'success')
+    return redirect(url_for('main.index'))
+
+@main.route('/usager/attente')
+def user_pending():
+    user = None
+    email = request.args.get('email', '').strip().lower()
+    if email:
+        user = User.query.filter_by(email=email).first()
+    user_id = session.get('user_id')
+    if not user and user_id:
+        user = User.query.get(user_id)
+    return render_template('user_pending.html', user=user)
+
+@main.route('/usager')
+@user_required
+def user_portal():
+    user = User.query.get(session['user_id'])
+    books = Book.query.order_by(Book.title.asc()).all()
+    return render_template('user_portal.html', user=user, books=books)
+
+@main.route('/usager/emprunter', methods=['POST'])
+@user_required
+def user_borrow():
+    user = User.query.get(session['user_id'])
+    book_id = int(request.form['book_id'])
+    book = Book.query.get_or_404(book_id)
+    if book.available_copies() <= 0:
+        flash('Aucune copie disponible', 'danger')
+        return redirect(url_for('main.user_portal'))
+    if user.active_loans_count() >= current_app.config['MAX_ACTIVE_LOANS']:
+        flash('Limite d emprunts atteinte', 'danger')
+        return redirect(url_for('main.user_portal'))
+    before = facet_snapshot(book)
+    loan = Loan(user_id=user.id, book_id=book.id, due_date=datetime.utcnow() + timedelta(days=current_app.config['DEFAULT_LOAN_DAYS']))
+    db.session.add(loan)
+    update_facet_counts(before, facet_snapshot(book))
+    rollups.record_event('loans', user.id, book.id)
+    db.session.commit()
+    log_action('user', user.id, 'BORROW_CREATED', 'loan', loan.id, {'book_id': book.id})
+    db.session.commit()
+    flash('Emprunt enregistre', 'success')
+    return redirect(url_for('main.user_portal'))
+
+@main.route('/usager/reserver', methods=['POST'])
+@user_required
+def user_reserve():
+    user = User.query.get(session['user_id'])
+    book_id = int(request.form['book_id'])
+    book = Book.query.get_or_404(book_id)
+    if Reservation.query.filter_by(user_id=user.id, book_id=book.id, active=True).first():
+        flash('Reservation deja existante', 'warning')
+        return redirect(url_for('main.user_portal'))
+    r = Reservation(user_id=user.id, book_id=book.id, expires_on=datetime.utcnow() + timedelta(days=current_app.config['DEFAULT_RESERVATION_DAYS']))
+    db.session.add(r)
+    rollups.record_event('reservations', user.id, book.id)
+    db.session.commit()
+    log_action('user', user.id, 'RESERVATION_CREATED', 'reservation', r.id, {'book_id': book.id})
+    db.session.commit()
+    flash('Reservation enregistree', 'success')
+    return redirect(url_for('main.user_portal'))
+
+@main.route('/books')
+@read_replica
+def list_books():
+    filters = {
+        'category': request.args.get('category', '').strip() or None,
+        'language': request.args.get('language', '').strip() or None,
+        'decade': request.args.get('decade', '').strip() or None,
+        'availability': request.args.get('availability', '').strip() or None,
+    }
+    page = max(1, request.args.get('page', 1, type=int) or 1)
+    per_page = current_app.config['BOOKS_PER_PAGE']
+    query = filter_books(Book.query, **filters).order_by(Book.title.asc(), Book.id.asc())
+    books = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+    has_next = len(books) > per_page
+    books = books[:per_page]
+    current_user = None
+    user_id = session.get('user_id')
+    if user_id:
+        current_user = User.query.get(user_id)
+    user_can_transact = bool(current_user and current_user.approved and current_user.is_active)
+    user_can_view_details = bool(session.get('admin') or user_can_transact)
+    return render_template(
+        'books.html',
+        books=books,
+        available=available_copies_map(books),
+        facets=facet_counts(),
+        filters=filters,
+        page=page,
+        has_next=has_next,
+        current_user=current_user,
+        user_can_transact=user_can_transact,
+        user_can_view_details=user_can_view_details
+    )
+
+@main.route('/add_book', methods=['GET', 'POST'])
+@login_required_admin
+def add_book():
+    if request.method == 'POST':
+        title = request.form.get('title', '').strip()
+        author = request.form.get('author', '').strip()
+        total_copies = request.form.get('total_copies', '1')
+        
+        if not title or not author:
+            flash('Le titre et l\'auteur sont obligatoires', 'danger')
+            return redirect(url_for('main.add_book'))
+        
+        try:
+            total_copies = int(total_copies)
+            if total_copies < 1:
+                raise ValueError
+        except ValueError:
+            flash('Le nombre de copies doit être un nombre entier positif', 'danger')
+            return redirect(url_for('main.add_book'))
+        
+        # Vérifier si le livre existe déjà
+        existing_book = Book.query.filter_by(title=title, author=author).first()
+        if existing_book:
+            book = existing_book
+            before = facet_snapshot(book)
+            book.total_copies += total_copies
+            update_facet_counts(before, facet_snapshot(book))
+            db.session.commit()
+            flash(f'✓ Livre existant mise à jour: {total_copies} copie(s) ajoutée(s)', 'success')
+        else:
+            book = Book(title=title, author=author, total_copies=total_copies)
+            db.session.add(book)
+            db.session.flush()
+            update_facet_counts(None, facet_snapshot(book))
+            db.session.commit()
+            current_app.extensions['suggest_index'].add_book(book)
+            flash(f'✓ Nouvel ouvrage ajouté: {title}', 'success')
+        
+        return redirect(url_for('main.book_detail', book_id=book.id))
+    
+    # GET request - afficher le formulaire avec les derniers livres
+    recent_books = Book.query.order_by(Book.id.desc()).limit(5).all()
+    return render_template('add_book.html', recent_books=recent_books)
+
+@main.route('/search')
+@read_replica
+def search():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return redirect(url_for('main.index'))
+    books = Book.query.filter(
+        (Book.title.ilike(f'%{q}%')) | 
+        (Book.author.ilike(f'%{q}%'))
+    ).all()
+    return render_template('search.html', query=q, books=books)
+
+@main.route('/book/<int:book_id>')
+def book_detail(book_id):
+    book = Book.query.get_or_404(book_id)
+    is_admin = bool(session.get('admin'))
+
+    similar = similar_books(book.id, limit=current_app.config['SIMILAR_BOOKS_SHOWN'])
+    if is_admin:
+        return render_template('book_detail.html', book=book, is_admin=True, viewer_user=None, similar_books=similar)
+
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Connectez-vous avec votre email pour acceder aux details, ou inscrivez-vous', 'warning')
+        return redirect(url_for('main.user_login'))
+
+    viewer_user = User.query.get(user_id)
+    if not viewer_user:
+        session.pop('user_id', None)
+        flash('Compte usager introuvable', 'danger')
+        return redirect(url_for('main.user_login'))
+    if not viewer_user.is_active:
+        flash('Compte usager inactif. Contactez l administration', 'danger')
+        return redirect(url_for('main.user_login'))
+    if not viewer_user.approved:
+        flash('Compte en attente de validation par l administration', 'warning')
+        return redirect(url_for('main.user_pending'))
+
+    return render_template('book_detail.html', book=book, is_admin=False, viewer_user=viewer_user, similar_books=similar)
+
+
+@main.route('/users')
+@login_required_admin
+def users():
+    users = User.query.order_by(User.approved.asc(), User.registered_on.asc()).all()
+    return render_template('users.html', users=users)
+
+@main.route('/register', methods=['GET', 'POST'])
+@login_required_admin
+def register():
+    if request.method == 'POST':
+        name = request.form['name']
+        email = request.form['email']
+        if User.query.filter_by(email=email).first():
+            flash('Email déjà utilisé', 'warning')
+            return redirect(url_for('main.register'))
+        u = User(
+            name=name,
+            email=email,
+            card_number=generate_card_number(),
+            affiliation='Staff',
+            approved=True,
+            approved_on=datetime.utcnow(),
+            is_active=True
+        )
+        db.session.add(u)
+        db.session.commit()
+        log_action('admin', None, 'USER_CREATED_ADMIN', 'user', u.id, {'email': u.email})
+        db.session.commit()
+        current_app.extensions['suggest_index'].add_user(u)
+        flash('Utilisateur enregistré', 'success')
+        return redirect(request.referrer or url_for('main.users'))
+    return render_template('register_user.html')
+
+@main.route('/profile/<int:user_id>')
+@login_required_admin
+def profile(user_id):
+    user = User.query.get_or_404(user_id)
+    pages = {
+        'loans_page': max(request.args.get('loans_page', 1, type=int) or 1, 1),
+        'reservations_page': max(request.args.get('reservations_page', 1, type=int) or 1, 1),
+        'history_before': request.args.get('history_before')
+    }
+    per_page = current_app.config['PROFILE_PAGE_SIZE']
+    active_loans, loans_next = profiles.active_loans_page(user.id, pages['loans_page'], per_page)
+    reservations, reservations_next, available = profiles.active_reservations_page(user.id, pages['reservations_page'], per_page)
+    history, history_next = profiles.loan_history_page(user.id, profiles.parse_history_cursor(pages['history_before']), per_page)
+    return render_template('profile.html',
+        user=user,
+        summary=profiles.profile_summary(user.id),
+        pages=pages,
+        active_loans=active_loans,
+        loans_next=loans_next,
+        reservations=reservations,
+        reservations_next=reservations_next,
+        available=available,
+        history=history,
+        history_next=history_next)
+
+
+@main.route('/users/<int:user_id>/delete', methods=['POST'])
+@login_required_admin
+def delete_user(user_id):
+    user = User.query.get_or_404(user_id)
+
+    active_loans = Loan.query.filter_by(user_id=user.id, returned=False).count()
+    active_reservations = Reservation.query.filter_by(user_id=user.id, active=True).count()
+
+    if active_loans > 0 or active_reservations > 0:
+        flash('Suppression impossible: cet usager a des emprunts ou reservations actives', 'danger')
+        return redirect(request.referrer or url_for('main.users'))
+
+    changefeed.record_bulk_delete('loan', [row.id for row in Loan.query.with_entities(Loan.id).filter_by(user_id=user.id)])
+    changefeed.record_bulk_delete('reservation', [row.id for row in Reservation.query.with_entities(Reservation.id).filter_by(user_id=user.id)])
+    Loan.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+    Reservation.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+    changefeed.record_bulk_delete('loan', [row.id for row in LoanHistory.query.with_entities(LoanHistory.id).filter_by(user_id=user.id)])
+    changefeed.record_bulk_delete('reservation', [row.id for row in ReservationHistory.query.with_entities(ReservationHistory.id).filter_by(user_id=user.id)])
+    archive.delete_history(user_id=user.id)
+    db.session.delete(user)
+    db.session.commit()
+    log_action('admin', None, 'USER_DELETED', 'user', user_id, {'email': user.email})
+    db.session.commit()
+    current_app.extensions['suggest_index'].remove_user(user_id)
+
+    flash('Usager supprime avec succes', 'success')
+    return redirect(request.referrer or url_for('main.users'))
+
+@main.route('/users/<int:user_id>/approve', methods=['POST'])
+@login_required_admin
+def approve_user(user_id):
+    user = User.query.get_or_404(user_id)
+    if user.approved:
+        flash('Usager deja valide', 'warning')
+        return redirect(request.referrer or url_for('main.admin'))
+    user.approved = True
+    user.approved_on = datetime.utcnow()
+    db.session.commit()
+    log_action('admin', None, 'USER_APPROVED', 'user', user.id, {'email': user.email})
+    db.session.commit()
+    current_app.extensions['suggest_index'].add_user(user)
+    flash('Usager valide avec succes', 'success')
+    return redirect(request.referrer or url_for('main.admin'))
+
+
+@main.route('/books/<int:book_id>/delete', methods=['POST'])
+@login_required_admin
+def delete_book(book_id):
+    book = Book.query.get_or_404(book_id)
+
+    active_loans = Loan.query.filter_by(book_id=book.id, returned=False).count()
+    active_reservations = Reservation.query.filter_by(book_id=book.id, active=True).count()
+
+    if active_loans > 0 or active_reservations > 0:
+        flash('Suppression impossible: ce livre a des emprunts ou reservations actives', 'danger')
+        return redirect(url_for('main.list_books'))
+
+    update_facet_counts(facet_snapshot(book), None)
+    changefeed.record_bulk_delete('loan', [row.id for row in Loan.query.with_entities(Loan.id).filter_by(book_id=book.id)])
+    changefeed.record_bulk_delete('reservation', [row.id for row in Reservation.query.with_entities(Reservation.id).filter_by(book_id=book.id)])
+    Loan.query.filter_by(book_id=book.id).delete(synchronize_session=False)
+    Reservation.query.filter_by(book_id=book.id).delete(synchronize_session=False)
+    changefeed.record_bulk_delete('loan', [row.id for row in LoanHistory.query.with_entities(LoanHistory.id).filter_by(book_id=book.id)])
+    changefeed.record_bulk_delete('reservation', [row.id for row in ReservationHistory.query.with_entities(ReservationHistory.id).filter_by(book_id=book.id)])
+    archive.delete_history(book_id=book.id)
+    db.session.delete(book)
+    db.session.commit()
+    log_action('admin', None, 'BOOK_DELETED', 'book', book_id, {'title': book.title})
+    db.session.commit()
+    current_app.extensions['suggest_index'].remove_book(book_id)
+
+    flash('Livre supprime avec succes', 'success')
+    return redirect(url_for('main.list_books'))
+
+@main.route('/borrow', methods=['POST'])
+@login_required_admin
+def borrow():
+    user_id = int(request.form['user_id'])
+    book_id = int(request.form['book_id'])
+    user = User.query.get_or_404(user_id)
+    book = Book.query.get_or_404(book_id)
+    if not user.approved:
+        flash('Cet usager doit etre valide par l administration', 'danger')
+        return redirect(request.referrer or url_for('main.admin'))
+    if book.available_copies() <= 0:
+        flash('Aucune copie disponible', 'danger')
+        return redirect(request.referrer or url_for('main.admin'))
+    if user.active_loans_count() >= current_app.config['MAX_ACTIVE_LOANS']:
+        flash('Limite d\'emprunts atteinte', 'danger')
+        return redirect(request.referrer or url_for('main.admin'))
+    before = facet_snapshot(book)
+    loan = Loan(user_id=user.id, book_id=book.id, due_date=datetime.utcnow() + timedelta(days=current_app.config['DEFAULT_LOAN_DAYS']))
+    db.session.add(loan)
+    update_facet_counts(before, facet_snapshot(book))
+    rollups.record_event('loans', user.id, book.id)
+    db.session.commit()
+    log_action('admin', None, 'BORROW_CREATED_ADMIN', 'loan', loan.id, {'user_id': user.id, 'book_id': book.id})
+    db.session.commit()
+    flash('Emprunt enregistré', 'success')
+    return redirect(request.referrer or url_for('main.admin'))
+
+@main.route('/return', methods=['POST'])
+@login_required_admin
+def return_book():
+    loan_id = int(request.form['loan_id'])
+    loan = Loan.query.get_or_404(loan_id)
+    if loan.returned:
+        flash('Emprunt deja rendu', 'warning')
+        return redirect(request.referrer or url_for('main.admin'))
+    book = loan.book
+    before = facet_snapshot(book)
+    loan.returned = True
+    loan.returned_on = datetime.utcnow()
+    # after marking returned, try to fulfil next active reservation for this book
+    update_facet_counts(before, facet_snapshot(book))
+    rollups.record_event('returns', loan.user_id, book.id)
+    db.session.commit()
+
+    # check for active reservations ordered by date
+    next_res = Reservation.query.filter_by(book_id=book.id, active=True).order_by(Reservation.reserved_on.asc()).first()
+    if next_res and book.available_copies() > 0:
+        # create loan for reserved user
+        before = facet_snapshot(book)
+        new_loan = Loan(user_id=next_res.user_id, book_id=book.id, due_date=datetime.utcnow() + timedelta(days=current_app.config['DEFAULT_LOAN_DAYS']))
+        next_res.active = False
+        db.session.add(new_loan)
+        update_facet_counts(before, facet_snapshot(book))
+        rollups.record_event('loans', next_res.user_id, book.id)
+        db.session.commit()
+        log_action('admin', None, 'LOAN_RETURNED_AND_RESERVATION_FULFILLED', 'loan', new_loan.id, {'source_loan_id': loan.id, 'reservation_id': next_res.id})
+        db.session.commit()
+        flash(f'Retour enregistré. Réservation de {next_res.user.name} convertie en emprunt.', 'success')
+    else:
+        log_action('admin', None, 'LOAN_RETURNED', 'loan', loan.id, None)
+        db.session.commit()
+        flash('Retour enregistré', 'success')
+    return redirect(request.referrer or url_for('main.admin'))
+
+@main.route('/reserve', methods=['POST'])
+@login_required_admin
+def reserve():
+    user_id = int(request.form['user_id'])
+    book_id = int(request.form['book_id'])
+    user = User.query.get_or_404(user_id)
+    if not user.approved:
+        flash('Cet usager doit etre valide par l administration', 'danger')
+        return redirect(request.referrer or url_for('main.admin'))
+    if Reservation.query.filter_by(user_id=user_id, book_id=book_id, active=True).first():
+        flash('Réservation existante', 'warning')
+        return redirect(request.referrer or url_for('main.admin'))
+    r = Reservation(user_id=user_id, book_id=book_id, expires_on=datetime.utcnow() + timedelta(days=current_app.config['DEFAULT_RESERVATION_DAYS']))
+    db.session.add(r)
+    rollups.record_event('reservations', user_id, book_id)
+    db.session.commit()
+    log_action('admin', None, 'RESERVATION_CREATED_ADMIN', 'reservation', r.id, {'user_id': user_id, 'book_id': book_id})
+    db.session.commit()
+    flash('Réservation créée', 'success')
+    return redirect(request.referrer or url_for('main.admin'))
+
+@main.route('/cancel-loan/<int:loan_id>', methods=['POST'])
+@login_required_admin
+def cancel_loan(loan_id):
+    loan = Loan.query.get_or_404(loan_id)
+    if loan.returned:
+        flash('Emprunt deja termine', 'warning')
+        return redirect(request.referrer or url_for('main.admin'))
+    before = facet_snapshot(loan.book)
+    loan.returned = True
+    loan.returned_on = datetime.utcnow()
+    update_facet_counts(before, facet_snapshot(loan.book))
+    rollups.record_event('returns', loan.user_id, loan.book_id)
+    db.session.commit()
+    log_action('admin', None, 'LOAN_INTERRUPTED', 'loan', loan.id, None)
+    db.session.commit()
+    flash('Emprunt annule', 'success')
+    return redirect(request.referrer or url_for('main.admin'))
+
+@main.route('/cancel-reservation/<int:reservation_id>', methods=['POST'])
+@login_required_admin
+def cancel_reservation(reservation_id):
+    res = Reservation.query.get_or_404(reservation_id)
+    if not res.active:
+        flash('Reservation deja terminee', 'warning')
+        return redirect(request.referrer or url_for('main.admin'))
+    res.active = False
+    db.session.commit()
+    log_action('admin', None, 'RESERVATION_INTERRUPTED', 'reservation', res.id, None)
+    db.session.commit()
+    flash('Reservation annulee', 'success')
+    return redirect(request.referrer or url_for('main.admin'))
+
+@main.route('/extend-loan/<int:loan_id>', methods=['POST'])
+@login_required_admin
+def extend_loan(loan_id):
+    loan = Loan.query.get_or_404(loan_id)
+    if loan.returned:
+        flash('Impossible de prolonger un emprunt termine', 'danger')
+        return redirect(request.referrer or url_for('main.admin'))
+    days = current_app.config['LOAN_EXTENSION_DAYS']
+    base_due_date = loan.due_date or datetime.utcnow()
+    loan.due_date = base_due_date + timedelta(days=days)
+    db.session.commit()
+    log_action('admin', None, 'LOAN_EXTENDED', 'loan', loan.id, {'days': days})
+    db.session.commit()
+    flash(f'Emprunt prolonge de {days} jours', 'success')
+    return redirect(request.referrer or url_for('main.admin'))
+
+@main.route('/extend-reservation/<int:reservation_id>', methods=['POST'])
+@login_required_admin
+def extend_reservation(reservation_id):
+    res = Reservation.query.get_or_404(reservation_id)
+    if not res.active:
+        flash('Impossible de prolonger une reservation terminee', 'danger')
+        return redirect(request.referrer or url_for('main.admin'))
+    now = datetime.utcnow()
+    current_expiry = res.expires_on or now
+    if current_expiry < now:
+        current_expiry = now
+    days = current_app.config['RESERVATION_EXTENSION_DAYS']
+    res.expires_on = current_expiry + timedelta(days=days)
+    db.session.commit()
+    log_action('admin', None, 'RESERVATION_EXTENDED', 'reservation', res.id, {'days': days})
+    db.session.commit()
+    flash(f'Reservation prolongee de {days} jours', 'success')
+    return redirect(request.referrer or url_for('main.admin'))
+
+@main.route('/reservations/<int:reservation_id>/fulfill', methods=['POST'])
+@login_required_admin
+def fulfill_reservation(reservation_id):
+    reservation = Reservation.query.get_or_404(reservation_id)
+
+    if not reservation.active:
+        flash('Reservation deja traitee', 'warning')
+        return redirect(request.referrer or url_for('main.admin'))
+
+    if reservation.book.available_copies() <= 0:
+        flash('Aucune copie disponible pour ce livre', 'danger')
+        return redirect(request.referrer or url_for('main.admin'))
+
+    if reservation.user.active_loans_count() >= current_app.config['MAX_ACTIVE_LOANS']:
+        flash('Limite d emprunts atteinte pour cet usager', 'danger')
+        return redirect(request.referrer or url_for('main.admin'))
+
+    before = facet_snapshot(reservation.book)
+    loan = Loan(user_id=reservation.user_id, book_id=reservation.book_id, due_date=datetime.utcnow() + timedelta(days=current_app.config['DEFAULT_LOAN_DAYS']))
+    reservation.active = False
+    db.session.add(loan)
+    update_facet_counts(before, facet_snapshot(reservation.book))
+    rollups.record_event('loans', reservation.user_id, reservation.book_id)
+    db.session.commit()
+    log_action('admin', None, 'RESERVATION_FULFILLED', 'reservation', reservation.id, {'loan_id': loan.id})
+    db.session.commit()
+
+    flash('Reservation convertie en emprunt', 'success')
+    return redirect(request.referrer or url_for('main.admin'))
+
+@main.route('/admin')
+@login_required_admin
+@read_replica
+def admin():
+    from datetime import datetime
+    # emprunts actifs
+    active_loans = Loan.query.filter_by(returned=False).all()
+    # emprunts retournés (derniers)
+    returned_loans = Loan.query.filter_by(returned=True).order_by(Loan.borrowed_on.desc()).limit(10).all()
+    # réservations actives
+    reservations = Reservation.query.filter_by(active=True).all()
+    pending_users = User.query.filter_by(approved=False).order_by(User.registered_on.asc()).all()
+    # statistiques
+    total_books = Book.query.count()
+    total_users = User.query.count()
+    active_loans_count = Loan.query.filter_by(returned=False).count()
+    reservations_count = Reservation.query.filter_by(active=True).count()
+    
+    return render_template('admin.html',
+        active_loans=active_loans,
+        returned_loans=returned_loans,
+        reservations=reservations,
+        pending_users=pending_users,
+        total_books=total_books,
+        total_users=total_users,
+        active_loans_count=active_loans_count,
+        reservations_count=reservations_count,
+        now=datetime.utcnow())
+
+@main.route('/reservations')
+@login_required_admin
+@read_replica
+def reservations_dashboard():
+    # Réservations en attente
+    pending_list = Reservation.query.filter_by(active=True).order_by(Reservation.reserved_on.desc()).all()
+    
+    # Réservations complétées
+    completed_list = Reservation.query.filter_by(active=False).order_by(Reservation.reserved_on.desc()).limit(20).all()
+    
+    # Statistiques (lues depuis les agregats de circulation)
+    total_reservations, unique_users = rollups.reservation_totals()
+    pending_reservations = len(pending_list)
+    completed_reservations = len(completed_list)
+    
+    # Livres les plus réservés
+    popular_books = rollups.popular_books(limit=5)
+    
+    return render_template('reservations_dashboard.html',
+        pending_list=pending_list,
+        completed_list=completed_list,
+        popular_books=popular_books,
+        total_reservations=total_reservations,
+        pending_reservations=pending_reservations,
+        completed_reservations=completed_reservations,
+        unique_users=unique_users)
+
+@main.route('/admin/audit')
+@login_required_admin
+@read_replica
+def audit_dashboard():
+    filters = {
+        'actor': request.args.get('actor', '').strip(),
+        'action': request.args.get('action', '').strip(),
+        'entity': request.args.get('entity', '').strip(),
+        'start': request.args.get('start', '').strip(),
+        'end': request.args.get('end', '').strip()
+    }
+    logs, next_before = audit_log.search_logs(
+        actor=filters['actor'],
+        action=filters['action'],
+        entity=filters['entity'],
+        start=audit_log.parse_day(filters['start']),
+        end=audit_log.parse_day(filters['end']),
+        before_id=request.args.get('before', type=int),
+        limit=current_app.config['AUDIT_PAGE_SIZE']
+    )
+    return render_template('audit.html', logs=logs, filters=filters, next_before=next_before,
+        first_page=not request.args.get('before'))